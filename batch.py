@@ -0,0 +1,140 @@
+from simulator import Simulator, COMMANDS
+from randomizer import RANDOMIZERS
+from bot import Bot
+from multiprocessing import Pool
+import argparse
+import csv
+import itertools
+import json
+import random
+import sys
+from typing import Dict, List
+
+FIELDS = ['seed', 'width', 'height', 'threshold', 'filename', 'offset', 'angle', 'randomizer',
+          'policy', 'points', 'lines', 'placed', 'steps', 'top_out']
+
+
+class RandomPolicy:
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+        self.commands = [c for c in COMMANDS if c != 'gravity']
+
+    def __call__(self, sim: Simulator) -> List[str]:
+        return [self.random.choice(self.commands), 'gravity']
+
+
+class ScriptPolicy:
+    '''repeat a fixed list of commands, one per step'''
+
+    def __init__(self, script: List[str]):
+        self.commands = itertools.cycle(script)
+
+    def __call__(self, sim: Simulator) -> List[str]:
+        return [next(self.commands)]
+
+
+class BotPolicy:
+    def __init__(self, sim: Simulator):
+        self.bot = Bot(sim.core, sim.offset, sim.angle)
+
+    def __call__(self, sim: Simulator) -> List[str]:
+        self.bot.core = sim.core
+        return self.bot.plan()
+
+
+def run_game(job: Dict) -> Dict:
+    sim = Simulator(job['width'], job['height'], job['filename'],
+                    offset=job['offset'], angle=job['angle'], threshold=job['threshold'],
+                    randomizer=job['randomizer'])
+    sim.reset(job['seed'])
+    if job['script']:
+        policy = ScriptPolicy(job['script'])
+    elif job['policy'] == 'bot':
+        policy = BotPolicy(sim)
+    else:
+        # a seed of its own, the game already draws its pieces from job['seed']
+        policy = RandomPolicy(random.Random(job['seed']).getrandbits(64))
+
+    while sim.steps < job['max_steps'] and not sim.core.end:
+        sim.step(policy(sim))
+
+    result = {k: job[k] for k in FIELDS if k in job}
+    result.update({
+        'points': sim.core.points,
+        'lines': sim.core.lines,
+        'placed': sim.core.placed,
+        'steps': sim.steps,
+        'top_out': sim.steps if sim.core.end else None,
+    })
+    return result
+
+
+def jobs(args):
+    for width, height, threshold, filename, offset, angle, randomizer in itertools.product(
+            args.width, args.height, args.threshold, args.pieces, args.offset, args.angle, args.randomizer):
+        for game in range(args.games):
+            yield {
+                'seed': args.seed + game,
+                'width': width,
+                'height': height,
+                'threshold': threshold,
+                'filename': filename,
+                'offset': offset,
+                'angle': angle,
+                'randomizer': randomizer,
+                'policy': 'script' if args.script else args.policy,
+                'script': args.script,
+                'max_steps': args.max_steps,
+            }
+
+
+def parse_args(argv=None):
+    with open('config.json') as f:
+        core = json.load(f)['core']
+
+    parser = argparse.ArgumentParser(
+        description='play many headless games and record the results')
+    parser.add_argument('--games', type=int, default=10,
+                        help='games per parameter combination')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first game, the others follow')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--max-steps', type=int, default=5000)
+    parser.add_argument('--width', type=int, nargs='+', default=[core['width']])
+    parser.add_argument('--height', type=int, nargs='+', default=[core['height']])
+    parser.add_argument('--threshold', type=float, nargs='+', default=[100])
+    parser.add_argument('--pieces', nargs='+', default=[core['filename']])
+    parser.add_argument('--offset', type=float, nargs='+', default=[1])
+    parser.add_argument('--angle', type=float, nargs='+', default=[90])
+    parser.add_argument('--randomizer', nargs='+', choices=list(RANDOMIZERS),
+                        default=[core.get('randomizer', 'bag')])
+    parser.add_argument('--policy', choices=['random', 'bot'], default='random')
+    parser.add_argument('--script', nargs='+', choices=list(COMMANDS),
+                        help='commands repeated in order instead of a policy')
+    parser.add_argument('--output', default='-',
+                        help='.csv or .jsonl file, - for jsonl on stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    writer = None
+    if args.output.endswith('.csv'):
+        writer = csv.DictWriter(out, FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+    with Pool(args.processes) as pool:
+        for result in pool.imap_unordered(run_game, jobs(args)):
+            if writer:
+                writer.writerow(result)
+            else:
+                out.write(json.dumps(result) + '\n')
+            out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == '__main__':
+    main()
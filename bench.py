@@ -0,0 +1,218 @@
+from core import Core, BOARDS
+from overlap import OVERLAPS
+from snapshot import dumps, loads
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from typing import Callable, Dict, Tuple
+
+Case = Callable[[Core], Tuple[Callable, Callable]]
+
+
+def filled(width: int, height: int, filename: str, backend: str, overlap: str, full: int = 0) -> Core:
+    '''game with the lower half of the board partly filled, no row full
+    except the last full ones'''
+    core = Core(width, height, filename, backend, overlap, random.Random(0))
+    rng = np.random.default_rng(0)
+    area = np.zeros((height, width))
+    area[height // 2:] = rng.choice([0, 0.5, 1], (height - height // 2, width))
+    area[height // 2:, 0] = 0
+    if full:
+        area[-full:] = 1
+    color = np.empty((height, width, 4), np.uint8)
+    color[:] = (20, 20, 20, 255)
+    color[area > 0, :3] = rng.integers(0, 256, (int((area > 0).sum()), 3))
+    color[..., 3] = np.where(area > 0, np.clip(area * 255, 0, 255), 255)
+
+    dtype = core.board.arrays()[0].dtype
+    core.board = BOARDS[backend].from_arrays(area.astype(dtype), color)
+    return core
+
+
+def names(core: Core) -> Tuple[str, str]:
+    '''backend and overlap names of a game'''
+    backend = next(k for k, v in BOARDS.items() if isinstance(core.board, v))
+    overlap = next(k for k, v in OVERLAPS.items() if isinstance(core.overlap, v))
+    return backend, overlap
+
+
+def restore(core: Core) -> Callable[[], Core]:
+    '''a fresh copy of the game for each run'''
+    data = dumps(core)
+    overlap = names(core)[1]
+    return lambda: loads(data, core.pieces, core.filename, overlap)
+
+
+def case_merge(core: Core):
+    return lambda: core, lambda c: c.merge(c.mino)
+
+
+def case_move(core: Core):
+    # left and right in turns so the mino stays around the middle
+    steps = itertools.cycle([-1, 1])
+    return lambda: core, lambda c: c.move(next(steps), 0)
+
+
+def case_rotate_90(core: Core):
+    return lambda: core, lambda c: c.rotate(90)
+
+
+def case_rotate_any(core: Core):
+    # 37 and 360 are coprime, every whole angle comes up before one repeats
+    return lambda: core, lambda c: c.rotate(37)
+
+
+def case_harddrop(core: Core):
+    return restore(core), lambda c: c.harddrop(1)
+
+
+def case_clear_line(core: Core):
+    full = filled(core.width, core.height, core.filename, *names(core), full=4)
+    return restore(full), lambda c: c.clear_line()
+
+
+def case_new_bag(core: Core):
+    return lambda: core, lambda c: c.new_bag()
+
+
+def case_render(core: Core):
+    '''Game.render on the dummy SDL driver, the mino moves every frame'''
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from render import Game
+
+    with open('config.json') as f:
+        data = json.load(f)
+    data['extra'].update({'autoplay': 0, 'record': 0})
+    data['core'].update({'width': core.width, 'height': core.height,
+                         'filename': os.path.abspath(core.filename)})
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    size = max(1, min(20, 500 // core.height))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        with open(os.path.join(d, 'config.json'), 'w') as f:
+            json.dump(data, f)
+        os.chdir(d)
+        try:
+            game = Game(screen, size)
+        finally:
+            os.chdir(cwd)
+    game.core = core
+    steps = itertools.cycle([-1, 1])
+
+    def run(game):
+        game.core.move(next(steps), 0)
+        game.render()
+
+    return lambda: game, run
+
+
+CASES: Dict[str, Case] = {
+    'merge': case_merge,
+    'move': case_move,
+    'rotate 90': case_rotate_90,
+    'rotate any': case_rotate_any,
+    'harddrop': case_harddrop,
+    'clear_line': case_clear_line,
+    'new_bag': case_new_bag,
+    'render': case_render,
+}
+
+
+def measure(setup: Callable, run: Callable, repeat: int, min_time: float) -> float:
+    '''median over repeat rounds of the mean time of one run, setup is
+    not timed, a round lasts at least min_time'''
+    run(setup())
+    rounds = []
+    for _ in range(repeat):
+        total, n = 0.0, 0
+        while total < min_time:
+            state = setup()
+            start = time.perf_counter()
+            run(state)
+            total += time.perf_counter() - start
+            n += 1
+        rounds.append(total / n)
+    return statistics.median(rounds)
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float):
+    '''rows of name, baseline, result, relative change
+    and the names slower than baseline by more than threshold'''
+    rows, slower = [], []
+    for name, t in results.items():
+        if name not in baseline:
+            continue
+        change = t / baseline[name] - 1
+        rows.append((name, baseline[name], t, change))
+        if change > threshold:
+            slower.append(name)
+    return rows, slower
+
+
+def parse_args(argv=None):
+    with open('config.json') as f:
+        core = json.load(f)['core']
+
+    parser = argparse.ArgumentParser(description='time the hot paths of the game')
+    parser.add_argument('--sizes', nargs='+', default=['10x20', '25x50', '50x100', '100x200'],
+                        help='board sizes as WIDTHxHEIGHT')
+    parser.add_argument('--pieces', nargs='+', default=[core['filename']])
+    parser.add_argument('--backend', nargs='+', choices=list(BOARDS), default=list(BOARDS))
+    parser.add_argument('--overlap', default=core.get('overlap', 'shapely'))
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.1,
+                        help='seconds per round')
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--baseline', help='results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown over the baseline counted as a regression, 0.1 is 10%%')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = {}
+    for size, filename, backend, name in itertools.product(args.sizes, args.pieces, args.backend, args.cases):
+        width, height = map(int, size.split('x'))
+        key = f'{name}/{backend}/{size}/{os.path.basename(filename)}'
+        core = filled(width, height, filename, backend, args.overlap)
+        with contextlib.redirect_stdout(sys.stderr):
+            setup, run = CASES[name](core)
+        results[key] = measure(setup, run, args.repeat, args.min_time)
+        print(f'{key:<48} {results[key] * 1e6:>12.1f} us', flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'overlap': args.overlap,
+            'results': results,
+        }, f, indent=4)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    rows, slower = compare(results, baseline, args.threshold)
+    print()
+    for name, before, after, change in rows:
+        mark = '  slower' if name in slower else ''
+        print(f'{name:<48} {before * 1e6:>12.1f} {after * 1e6:>12.1f} us {change:>+8.1%}{mark}')
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+from cell import EMPTY, Cell
+import copy
+import numpy as np
+from typing import List, NamedTuple
+
+
+class Footprint(NamedTuple):
+    '''cells touched by a mino, walls at x == -1, x == width and y == height
+    contrib holds the density added by each block, one row per block'''
+    xs: np.ndarray
+    ys: np.ndarray
+    contrib: np.ndarray
+
+    def cells(self):
+        return zip(self.xs.tolist(), self.ys.tolist(), self.contrib.T.tolist())
+
+
+def cell_rgba(cell: Cell) -> List[int]:
+    color = cell.get_color()
+    return [*color[:3], min(color[3], 255) if len(color) == 4 else 255]
+
+
+class CellBoard:
+    # rows above top are empty
+    top = 0
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.version = 0
+        self.rows: List[List[Cell]] = []
+
+        for i in range(height):
+            self.rows.append(self.empty_row(i))
+        self.rows.append([Cell(j, height, 1.0) for j in range(-1, width + 1)])
+
+        self.weights: List[float] = [0.0] * height
+
+    def fits(self, footprint: Footprint) -> bool:
+        for x, y, contrib in footprint.cells():
+            area = self.rows[y][x + 1].area
+            for c in contrib:
+                area += round(c, 1)
+            if area > 1:
+                return False
+        return True
+
+    @classmethod
+    def from_arrays(cls, area: np.ndarray, color: np.ndarray) -> 'CellBoard':
+        height, width = area.shape
+        board = cls(width, height)
+        for y, (areas, colors) in enumerate(zip(area.tolist(), color[..., :3].tolist())):
+            row = board.rows[y]
+            for x, (a, c) in enumerate(zip(areas, colors)):
+                if a != 0 or c != EMPTY:
+                    row[x + 1].area = a
+                    row[x + 1].color = c
+            board.weights[y] = sum([cell.area for cell in row[1:-1]])
+        return board
+
+    def arrays(self):
+        return self.areas(), self.rgba()
+
+    def fits_shifted(self, footprint: Footprint, shifts: np.ndarray) -> np.ndarray:
+        '''fits of the footprint moved down by each shift, cells above the
+        board or under the floor are left out like Core.footprint does'''
+        ys = footprint.ys[None, :] + shifts[:, None]
+        keep = (ys >= 0) & (ys <= self.height)
+        if not keep.any():
+            return np.ones(len(shifts), dtype=bool)
+
+        top, bottom = int(ys[keep].min()), int(ys[keep].max())
+        left, right = int(footprint.xs.min()) + 1, int(footprint.xs.max()) + 2
+        rows = np.array([[cell.area for cell in row[left:right]] for row in self.rows[top:bottom + 1]])
+        area = rows[np.clip(ys - top, 0, bottom - top), footprint.xs + 1 - left]
+        # same order of additions as fits
+        for contrib in footprint.contrib.tolist():
+            area = area + np.array([round(c, 1) for c in contrib])
+        return ~(keep & (area > 1)).any(axis=1)
+
+    def merge(self, footprint: Footprint, color: List[int]) -> 'CellBoard':
+        '''copy of the board with the footprint added,
+        only the touched cells are copied'''
+        board = copy.copy(self)
+        board.rows = [row[:] for row in self.rows]
+        board.weights = self.weights[:]
+        for x, y, contrib in footprint.cells():
+            cell = copy.copy(board.rows[y][x + 1])
+            for c in contrib:
+                cell.add(c, color)
+            board.rows[y][x + 1] = cell
+
+        for y in set(footprint.ys.tolist()):
+            if y < self.height:
+                board.weights[y] = sum([cell.area for cell in board.rows[y][1:-1]])
+        return board
+
+    def preview(self, footprint: Footprint, color: List[int]):
+        '''touched cells and their colors as if the footprint was added'''
+        xs, ys, colors = [], [], []
+        for x, y, contrib in footprint.cells():
+            if 0 <= x < self.width and y < self.height:
+                cell = copy.copy(self.rows[y][x + 1])
+                for c in contrib:
+                    cell.add(c, color)
+                xs.append(x)
+                ys.append(y)
+                colors.append(cell_rgba(cell))
+        return np.array(xs, dtype=np.intp), np.array(ys, dtype=np.intp), \
+            np.array(colors, dtype=np.uint8).reshape(-1, 4)
+
+    def rgba(self, top: int = 0) -> np.ndarray:
+        '''colors of the rows from top down'''
+        return np.array([
+            [cell_rgba(cell) for cell in row[1:-1]] for row in self.rows[top:-1]
+        ], dtype=np.uint8).reshape(-1, self.width, 4)
+
+    def areas(self) -> np.ndarray:
+        return np.array([[cell.area for cell in row[1:-1]] for row in self.rows[:-1]])
+
+    def row_weights(self) -> List[float]:
+        return self.weights
+
+    def empty_row(self, y: int) -> List[Cell]:
+        return [
+            Cell(k, y, 1.0) if k == -1 or k == self.width else Cell(k, y, 0.0)
+            for k in range(-1, self.width + 1)
+        ]
+
+    def clear_lines(self, threshold: float) -> int:
+        '''drop the rows the weight index marks as full in one pass,
+        only rows above a cleared one move'''
+        limit = self.width * threshold / 100
+        full = [weight >= limit for weight in self.weights]
+        lines_cleared = sum(full)
+        if not lines_cleared:
+            return 0
+
+        kept = [i for i, f in enumerate(full) if not f]
+        rows = [self.empty_row(y) for y in range(lines_cleared)]
+        for y, i in enumerate(kept, lines_cleared):
+            if y != i:
+                for cell in self.rows[i]:
+                    cell.move(0, y - i)
+            rows.append(self.rows[i])
+
+        self.rows = rows + self.rows[-1:]
+        self.weights = [0.0] * lines_cleared + [self.weights[i] for i in kept]
+        self.version += 1
+        return lines_cleared
+
+    def __str__(self) -> str:
+        string = ''
+        for i in self.rows:
+            for j in i:
+                string += f'{j.area} '
+            string += '\n'
+        return string
@@ -0,0 +1,206 @@
+from core import Core
+from mino import Mino
+from collections import OrderedDict
+import copy
+import math
+import time
+import numpy as np
+from typing import List, NamedTuple, Tuple
+
+EPSILON = 1e-4
+# room around the board for cells of minos poking out of it
+PAD = 8
+
+
+class Expansion(NamedTuple):
+    commands: List[Tuple[str, ...]]
+    boards: np.ndarray
+    lines: np.ndarray
+    values: np.ndarray
+
+
+class Bot:
+    '''beam search over reachable placements of the current mino and the
+    next ones in the queue
+
+    a placement is rotate, slide, harddrop like a player would do it,
+    all slides and drop steps of a rotation are checked in one array
+    lookup and expansions of a board are cached, so the boards searched
+    ahead for one piece are mostly hits for the next one'''
+
+    weights = {'lines': 0.76, 'height': -0.51, 'holes': -0.36, 'bumpiness': -0.18}
+
+    def __init__(self, core: Core, offset: float = 1, angle: float = 90, depth: int = 3, beam: int = 8,
+                 budget: float = 0.033, cache_size: int = 4096):
+        self.core = core
+        self.offset = offset
+        self.angle = angle
+        self.depth = depth
+        self.beam = beam
+        self.budget = budget
+        self.cache_size = cache_size
+        self.expansions = OrderedDict()
+
+    def pad(self, area: np.ndarray) -> np.ndarray:
+        '''area with walls and floor, cells Core would drop are empty'''
+        h, w = area.shape
+        padded = np.zeros((h + 2 * PAD, w + 2 * PAD))
+        padded[PAD:PAD + h, PAD:PAD + w] = area
+        padded[PAD:PAD + h + 1, PAD - 1] = 1
+        padded[PAD:PAD + h + 1, PAD + w] = 1
+        padded[PAD + h, PAD - 1:PAD + w + 1] = 1
+        return padded
+
+    def positions(self, start: float, offsets: np.ndarray):
+        '''start + offsets split into whole cells and sub-cell phases,
+        with the offsets grouped by phase'''
+        pos = np.round(start + offsets, 6)
+        whole = np.floor(pos).astype(np.intp)
+        phase = np.round(pos - whole, 6)
+        groups = [(p, np.nonzero(phase == p)[0]) for p in dict.fromkeys(phase.tolist())]
+        return pos, whole, phase, groups
+
+    def fit_grid(self, padded: np.ndarray, mino: Mino, px, py):
+        '''fits of the mino moved to every pair of positions, one cached
+        footprint per pair of sub-cell phases, and a way to get the
+        footprint of any pair'''
+        x, wx, fx, groups_x = px
+        y, wy, fy, groups_y = py
+        fits = np.zeros((len(x), len(y)), dtype=bool)
+        footprints = {}
+        last_x, last_y = padded.shape[1] - 1, padded.shape[0] - 1
+
+        for phase_x, gx in groups_x:
+            for phase_y, gy in groups_y:
+                moved = copy.copy(mino)
+                moved.move(x[gx[0]] - mino.x, y[gy[0]] - mino.y)
+                xs, ys, contrib = moved.footprint(self.core.overlap)
+                added = np.round(contrib, 1).sum(axis=0)
+
+                cx = np.clip(xs + (wx[gx] - wx[gx[0]])[:, None, None] + PAD, 0, last_x)
+                cy = np.clip(ys + (wy[gy] - wy[gy[0]])[None, :, None] + PAD, 0, last_y)
+                fits[np.ix_(gx, gy)] = \
+                    (padded[cy, cx] + added <= 1 + EPSILON).all(axis=-1)
+                footprints[phase_x, phase_y] = (xs, ys, added, wx[gx[0]], wy[gy[0]])
+
+        def at(i: int, j: int):
+            xs, ys, added, x0, y0 = footprints[fx[i], fy[j]]
+            return xs + wx[i] - x0, ys + wy[j] - y0, added
+
+        return fits, at
+
+    def expand(self, area: np.ndarray, mino: Mino) -> Expansion:
+        '''every board reachable by placing the mino, a rotation that
+        does not fit stops further turns that way'''
+        key = (area.tobytes(), id(mino.shape), round(mino.angle, 6), round(mino.x, 6), round(mino.y, 6),
+               self.offset, self.angle, self.core.threshold)
+        if key in self.expansions:
+            self.expansions.move_to_end(key)
+            return self.expansions[key]
+
+        h, w = area.shape
+        padded = self.pad(area)
+        reach = math.ceil((w + 2) / self.offset)
+        px = self.positions(mino.x, np.arange(-reach, reach + 1) * self.offset)
+        py = self.positions(mino.y, np.arange(int((h + 4) / self.offset) + 2) * self.offset)
+        turns = max(math.ceil(360 / abs(self.angle)) - 1, 0) if self.angle else 0
+
+        commands, cells = [], []
+        seen = set()
+        for command, angle in (('ccw', self.angle), ('cw', -self.angle)):
+            rotated = mino
+            for k in range(turns + 1):
+                if k:
+                    rotated = copy.copy(rotated)
+                    rotated.rotate(angle)
+                pose = round(rotated.angle, 6)
+                if pose in seen:
+                    continue
+
+                fits, at = self.fit_grid(padded, rotated, px, py)
+                if not fits[reach, 0]:
+                    break
+                seen.add(pose)
+
+                blocked = np.nonzero(~fits[:, 0])[0]
+                left = blocked[blocked < reach].max() + 1 if (blocked < reach).any() else 0
+                right = blocked[blocked > reach].min() if (blocked > reach).any() else len(fits)
+                slides = fits[left:right]
+                landing = np.where(slides.all(axis=1), len(py[0]) - 1, np.argmin(slides, axis=1) - 1)
+                for i, j in enumerate(landing, left):
+                    shift = i - reach
+                    slide = ('left', ) * -shift if shift < 0 else ('right', ) * shift
+                    commands.append((command, ) * k + slide + ('harddrop', ))
+                    cells.append(at(i, j))
+
+        boards, lines = self.place(area, cells)
+        expansion = Expansion(commands, boards, lines, self.evaluate(boards))
+        self.expansions[key] = expansion
+        if len(self.expansions) > self.cache_size:
+            self.expansions.popitem(last=False)
+        return expansion
+
+    def place(self, area: np.ndarray, cells: List) -> Tuple[np.ndarray, np.ndarray]:
+        '''boards after each placement and its line clear'''
+        h, w = area.shape
+        boards = np.repeat(area[None], len(cells), axis=0)
+        if cells:
+            n = np.concatenate([np.full(len(c[0]), i) for i, c in enumerate(cells)])
+            xs, ys, added = (np.concatenate(c) for c in zip(*cells))
+            inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+            boards[n[inside], ys[inside], xs[inside]] += added[inside]
+
+        # areas are tenths, keep them exact so equal boards hash equal
+        boards = np.round(boards, 1)
+        full = boards.sum(axis=2) >= w * self.core.threshold / 100 - EPSILON
+        lines = full.sum(axis=1)
+        for board, rows, n in zip(boards, full, lines):
+            if n:
+                board[n:] = board[~rows]
+                board[:n] = 0
+        return boards, lines
+
+    def evaluate(self, boards: np.ndarray) -> np.ndarray:
+        n, h, w = boards.shape
+        filled = boards > EPSILON
+        top = np.where(filled.any(axis=1), filled.argmax(axis=1), h)
+        heights = h - top
+        below = np.arange(h)[None, :, None] >= top[:, None, :]
+
+        return self.weights['height'] * heights.sum(axis=1) + \
+            self.weights['holes'] * ((1 - boards) * below).sum(axis=(1, 2)) + \
+            self.weights['bumpiness'] * np.abs(np.diff(heights, axis=1)).sum(axis=1)
+
+    def plan(self) -> List[str]:
+        '''commands placing the current mino, best after depth pieces
+        or after the deepest level searched within the budget'''
+        core = self.core
+        deadline = time.perf_counter() + self.budget
+        minos = [core.mino]
+        for m in core.queue.peek(self.depth - 1):
+            m = copy.copy(m)
+            m.move(core.width // 2 - 1, 0)
+            minos.append(m)
+
+        frontier = [(0.0, np.round(core.board.areas(), 1), ())]
+        best = ('harddrop', )
+        for depth, mino in enumerate(minos):
+            children = {}
+            for value, area, first in frontier:
+                if depth and time.perf_counter() > deadline:
+                    return list(best)
+                expansion = self.expand(area, mino)
+                totals = value + self.weights['lines'] * expansion.lines
+                for i, commands in enumerate(expansion.commands):
+                    board = expansion.boards[i]
+                    key = board.tobytes()
+                    if key not in children or children[key][0] < totals[i]:
+                        children[key] = (totals[i], expansion.values[i], board, first or commands)
+
+            if not children:
+                break
+            ranked = sorted(children.values(), key=lambda c: c[0] + c[1], reverse=True)
+            frontier = [(total, board, first) for total, _, board, first in ranked[:self.beam]]
+            best = frontier[0][2]
+
+        return list(best)
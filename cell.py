@@ -1,38 +1,83 @@
 from shapely.geometry import box
-from shapely.affinity import translate
+import numpy as np
 from typing import List
 
+# colors are replaced, never changed in place, so empty cells share one
+EMPTY = [20, 20, 20]
+
+# Cell.blend of every pair of 8-bit channels
+_channel = np.arange(256)
+RMS = np.sqrt((_channel[:, None] ** 2 + _channel[None, :] ** 2) / 2).astype(np.uint8)
+RMS_ROWS = RMS.tolist()
+
+
+def composite(area: np.ndarray, rgb: np.ndarray, contrib: np.ndarray, color: List[int]):
+    '''Cell.add of every block over many cells at once, contrib holds
+    the density added by each block, one row per block'''
+    # pieces are validated to 8-bit colors, so every blend is in the table
+    c = np.array(color, np.int64)
+    for x, added in zip(contrib, np.round(contrib, 1)):
+        area = area + added
+        filled = area != 0
+        empty = (rgb == EMPTY).all(axis=1)
+        blend = filled & ~empty & (x > 0.1)
+
+        rgb[blend] = RMS[rgb[blend], c]
+        rgb[filled & empty] = c
+        rgb[~filled] = EMPTY
+    return area, rgb
+
 
 class Cell:
+    '''grid cell, the box is only built when asked for'''
+
+    __slots__ = ('x', 'y', 'area', 'color')
+
     def __init__(self, x: int, y: int, area: float = 0.0):
-        self.box = box(x, y, x + 1, y + 1)
+        self.x = x
+        self.y = y
         self.area = area
-        self.color = [20, 20, 20]
+        self.color = EMPTY
 
-    def intersect(self, block: box, color: List[int]):
-        x = block.box.intersection(self.box).area * \
+    def overlap(self, block) -> float:
+        return block.box.intersection(self.box).area * \
             block.density / self.box.area
+
+    def intersect(self, block: box, color: List[int]):
+        self.add(self.overlap(block), color)
+
+    def add(self, x: float, color: List[int]):
         self.area += round(x, 1)
 
         if self.area != 0:
-            if self.color == [20, 20, 20]:
+            if self.color == EMPTY:
                 self.color = color
             elif x > 0.1:
                 self.blend(color)
         else:
-            self.color = [20, 20, 20]
+            self.color = EMPTY
+
+    def __copy__(self) -> 'Cell':
+        cell = Cell.__new__(Cell)
+        cell.x = self.x
+        cell.y = self.y
+        cell.area = self.area
+        cell.color = self.color
+        return cell
+
+    def __deepcopy__(self, memo) -> 'Cell':
+        return self.__copy__()
+
+    @property
+    def box(self):
+        return box(self.x, self.y, self.x + 1, self.y + 1)
 
     def move(self, xoff: int, yoff: int):
-        self.box = translate(self.box, xoff=xoff, yoff=yoff)
+        self.x += xoff
+        self.y += yoff
 
     def blend(self, c: List[int]):
-        color = [0, 0, 0]
-        for i in range(3):
-            color[i] = self.color[i] ** 2 + c[i] ** 2
-            color[i] /= 2
-            color[i] = int(color[i]**(1 / 2))
-
-        self.color = color
+        self.color = [RMS_ROWS[a][b] for a, b in zip(self.color, c)]
 
     def get_color(self):
         if self.area == 0:
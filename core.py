@@ -1,98 +1,123 @@
-from cell import Cell
+from board import CellBoard, Footprint
+from grid import GridBoard
+from sparse import SparseBoard
 from mino import Mino
-import json
+from overlap import OVERLAPS
+from pieces import PieceQueue, PieceSet, load_pieces
+from randomizer import RANDOMIZERS
 import random
 import copy
-from typing import List, Tuple, Union, Any
+import math
+import numpy as np
+from typing import List, Sequence, Union, Any
 
 
-def load_mino(data) -> Mino:
-    name: str = data['name']
-    color: List[int] = data['color']
-    blocks: List[Tuple[int, int, float]] = [
-        (i, j, d) for i, j, d in data['blocks']]
-
-    center = data['center'] if 'center' in data else None
-
-    return Mino(name, blocks, color, center)
+BOARDS = {'cells': CellBoard, 'grid': GridBoard, 'sparse': SparseBoard}
+# fewest drop steps checked at once
+CHUNK = 32
 
 
 class Core:
-    def __init__(self, width: int, height: int, filename: str):
-        self.board: List[List[Cell]] = []
+    def __init__(self, width: int, height: int, filename: str, backend: str = 'cells', overlap: str = 'shapely',
+                 rng: random.Random = None, pieces: PieceSet = None, lookahead: int = 6,
+                 randomizer: str = 'bag', seed: int = None):
+        self.board: Union[CellBoard, GridBoard, SparseBoard] = BOARDS[backend](width, height)
+        self.overlap = OVERLAPS[overlap]()
         self.filename = filename
+        self.pieces = pieces if pieces else load_pieces(filename)
+        # each game draws from its own stream, seeded by seed if no rng is given
+        self.random = rng if rng else random.Random(seed)
+        self.randomizer = RANDOMIZERS[randomizer](self.pieces, self.random)
         self.width = width
         self.height = height
         self.threshold = 100
         self.end = False
         self.points = 0
+        self.lines = 0
+        self.placed = 0
 
-        for i in range(height + 1):
-            self.board.append([])
-            for j in range(-1, width + 1):
-                if j == -1 or j == width or i == height:
-                    self.board[i].append(Cell(j, i, 1.0))
-                else:
-                    self.board[i].append(Cell(j, i, 0.0))
-
-        self.queue = self.new_bag()
+        self.queue = PieceQueue(self.new_bag, lookahead, self.warm)
         self.mino: Mino = self.new_mino()
 
     def new_bag(self) -> List[Mino]:
-        minos = []
-        with open(self.filename) as f:
-            data = json.load(f)
-            for m in data:
-                mino = load_mino(m)
-                minos.append(mino)
+        return self.randomizer.next()
 
-        random.shuffle(minos)
-        return minos
+    def warm(self, mino: Mino):
+        '''footprint of the spawn pose, so the spawn finds it cached'''
+        mino.footprint(self.overlap, self.width // 2 - 1, 0)
 
     def new_mino(self) -> Mino:
-        mino = self.queue.pop(0)
+        mino = self.queue.pop()
         mino.move(self.width // 2 - 1, 0)
-        if len(self.queue) < 6:
-            self.queue.extend(self.new_bag())
-
         return mino
 
-    def check(self, block, tmp_board):
-        center = block.box.centroid
-        x, y = int(center.x), int(center.y)
-        for i in (-1, 0, 1):
-            for j in (-1, 0, 1):
-                c_y, c_x = y + i, x + j
-                if 0 <= c_y < len(tmp_board) and 0 <= c_x < len(tmp_board[0]):
-                    tmp_board[c_y][c_x].intersect(block)
-
-    def merge(self, mino: Mino) -> Union[List[List[Cell]], Any]:
+    def footprint(self, mino: Mino) -> Footprint:
+        xs, ys, contrib = mino.footprint(self.overlap)
+        keep = (xs >= -1) & (xs <= self.width) & (ys >= 0) & (ys <= self.height)
+        return Footprint(xs[keep], ys[keep], contrib[:, keep])
+
+    def fits_at(self, mino: Mino, ys: Sequence[float]) -> np.ndarray:
+        '''fits of the mino at each y, the positions sharing a sub-cell
+        phase share one footprint and one board lookup'''
+        fits = np.zeros(len(ys), dtype=bool)
+        phases = {}
+        for i, y in enumerate(ys):
+            y = round(y, 6)
+            iy = math.floor(y)
+            phases.setdefault(round(y - iy, 6), []).append((i, iy))
+
+        for steps in phases.values():
+            i, iy = steps[0]
+            xs, fys, contrib = mino.footprint(self.overlap, mino.x, ys[i])
+            keep = (xs >= -1) & (xs <= self.width)
+            footprint = Footprint(xs[keep], fys[keep], contrib[:, keep])
+            index = np.array([j for j, _ in steps])
+            shifts = np.array([y - iy for _, y in steps])
+            # a mino all below the floor does not fit, it would fall forever
+            below = footprint.ys.min() + shifts > self.height if len(footprint.ys) else True
+            fits[index] = self.board.fits_shifted(footprint, shifts) & ~below
+        return fits
+
+    def drop(self, mino: Mino, yoff: float) -> Mino:
+        '''copy of the mino moved down by yoff as long as it fits, the same
+        as moving it one step at a time'''
+        dropped = copy.copy(mino)
+        y = mino.y
+        # enough steps to reach the floor, more only for minos above the board
+        chunk = max(math.ceil((self.height - y) / yoff) + 1, CHUNK)
+        while True:
+            ys = []
+            for _ in range(chunk):
+                y += yoff
+                ys.append(y)
+            blocked = np.flatnonzero(~self.fits_at(mino, ys))
+            for _ in range(blocked[0] if len(blocked) else chunk):
+                dropped.move(0, yoff)
+            if len(blocked):
+                return dropped
+            chunk *= 2
+
+    def fits(self, mino: Mino) -> bool:
+        '''check if mino can be merged without copying the board'''
+        return self.board.fits(self.footprint(mino))
+
+    def merge(self, mino: Mino) -> Union[CellBoard, GridBoard, SparseBoard, Any]:
         '''merge current board with mino
         if not return None'''
-        def generate_set(block, _max: Tuple[int, int]):
-            center = block.box.centroid
-            x, y = int(center.x), int(center.y)
-            s = set()
-            for i in (-1, 0, 1):
-                for j in (-1, 0, 1):
-                    c_x, c_y = x + j, y + i
-                    if -1 <= c_x < _max[0] - 1 and 0 <= c_y < _max[1]:
-                        s.add((c_x, c_y))
-
-            return s
-
-        tmp_board = copy.deepcopy(self.board)
-        cells = set()
-        for b in mino.blocks:
-            x = generate_set(b, (len(tmp_board[0]), len(tmp_board)))
-            cells |= x
-
-        for x, y in cells:
-            for b in mino.blocks:
-                tmp_board[y][x + 1].intersect(b, mino.color)
-            if tmp_board[y][x + 1].area > 1:
-                return None
-        return tmp_board
+        footprint = self.footprint(mino)
+        if not self.board.fits(footprint):
+            return None
+
+        return self.board.merge(footprint, mino.color)
+
+    def preview(self, mino: Mino):
+        '''cells of the board the mino changes and their merged colors,
+        None if it does not fit'''
+        footprint = self.footprint(mino)
+        if not self.board.fits(footprint):
+            return None
+
+        return self.board.preview(footprint, mino.color)
 
     def place(self):
         board = self.merge(self.mino)
@@ -102,12 +127,14 @@ class Core:
             self.end = True
         lines = self.clear_line()
         self.calculate_points(lines)
+        self.lines += lines
+        self.placed += 1
         self.mino = self.new_mino()
 
     def move(self, xoff: int, yoff: int):
-        tmp_mino = copy.deepcopy(self.mino)
+        tmp_mino = copy.copy(self.mino)
         tmp_mino.move(xoff, yoff)
-        if self.merge(tmp_mino):
+        if self.fits(tmp_mino):
             self.mino = tmp_mino
         elif yoff != 0:
             if self.mino.can_fall == False:
@@ -116,36 +143,19 @@ class Core:
                 self.mino.can_fall = False
 
     def rotate(self, angle: float):
-        tmp_mino = copy.deepcopy(self.mino)
+        tmp_mino = copy.copy(self.mino)
         tmp_mino.rotate(angle)
-        if self.merge(tmp_mino):
+        if self.fits(tmp_mino):
             self.mino = tmp_mino
 
     def harddrop(self, yoff):
-        while self.mino.can_fall:
-            self.move(0, yoff)
+        if self.mino.can_fall and yoff > 0:
+            self.mino = self.drop(self.mino, yoff)
+            self.mino.can_fall = False
         self.place()
 
     def clear_line(self) -> int:
-        lines_cleared = 0
-
-        for i, row in enumerate(self.board[:-1]):
-            weight = sum([cell.area for cell in row[1:-1]])
-            if weight >= self.width * self.threshold / 100:
-                while i != 0:
-                    self.board[i] = self.board[i - 1]
-                    for z in self.board[i]:
-                        z.move(0, 1)
-                    i -= 1
-
-                self.board[0] = [
-                    Cell(k, 0, 1.0)
-                    if k == -1 or k == self.width else Cell(k, 0, 0.0)
-                    for k in range(-1, self.width + 1)
-                ]
-                lines_cleared += 1
-
-        return lines_cleared
+        return self.board.clear_lines(self.threshold)
 
     def calculate_points(self, lines_cleared: int):
         multiplier = self.threshold
@@ -155,12 +165,7 @@ class Core:
             self.points += lines_cleared * multiplier
 
     def print_board(self):
-        string = ''
-        for i in self.board:
-            for j in i:
-                string += f'{j.area} '
-            string += '\n'
-        print(string)
+        print(self.board)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,149 @@
+from board import Footprint
+from cell import composite
+import numpy as np
+from typing import List
+
+EMPTY = (20, 20, 20, 255)
+# areas are float32, keep sums of tenths from tipping over a limit
+EPSILON = 1e-4
+
+
+class GridBoard:
+    '''board stored as contiguous arrays, walls and floor are implicit
+    color is RGBA with the alpha channel following the area'''
+
+    # rows above top are empty
+    top = 0
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.area = np.zeros((height, width), np.float32)
+        self.color = np.empty((height, width, 4), np.uint8)
+        self.color[:] = EMPTY
+        self.weights = np.zeros(height)
+        self.version = 0
+
+    def _areas_at(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        return self.area[ys, xs]
+
+    def _colors_at(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        return self.color[ys, xs]
+
+    def _inside(self, footprint: Footprint) -> np.ndarray:
+        xs, ys = footprint.xs, footprint.ys
+        return (xs >= 0) & (xs < self.width) & (ys < self.height)
+
+    def fits(self, footprint: Footprint) -> bool:
+        inside = self._inside(footprint)
+        added = np.round(footprint.contrib, 1).sum(axis=0)
+        if (added[~inside] > 0).any():
+            return False
+
+        area = self._areas_at(footprint.ys[inside], footprint.xs[inside]) + \
+            added[inside]
+        return not (area > 1 + EPSILON).any()
+
+    @classmethod
+    def from_arrays(cls, area: np.ndarray, color: np.ndarray) -> 'GridBoard':
+        '''board over the given arrays, they are only copied if read-only'''
+        board = cls.__new__(cls)
+        board.height, board.width = area.shape
+        board.area = area if area.flags.writeable else area.copy()
+        board.color = color if color.flags.writeable else color.copy()
+        board.weights = board.area.sum(axis=1, dtype=np.float64)
+        board.version = 0
+        return board
+
+    def arrays(self):
+        return self.area, self.color
+
+    def fits_shifted(self, footprint: Footprint, shifts: np.ndarray) -> np.ndarray:
+        '''fits of the footprint moved down by each shift, cells above the
+        board or under the floor are left out like Core.footprint does'''
+        xs = footprint.xs
+        if not len(xs):
+            return np.ones(len(shifts), dtype=bool)
+
+        ys = footprint.ys[None, :] + shifts[:, None]
+        added = np.round(footprint.contrib, 1).sum(axis=0)
+        keep = (ys >= 0) & (ys <= self.height)
+        inside = keep & ((xs >= 0) & (xs < self.width))[None, :] & (ys < self.height)
+        out = (keep & ~inside & (added > 0)).any(axis=1)
+        area = self._areas_at(np.clip(ys, 0, self.height - 1), np.clip(xs, 0, self.width - 1)) + added
+        return ~out & ~(inside & (area > 1 + EPSILON)).any(axis=1)
+
+    def copy(self) -> 'GridBoard':
+        board = GridBoard.__new__(GridBoard)
+        board.width = self.width
+        board.height = self.height
+        board.area = self.area.copy()
+        board.color = self.color.copy()
+        board.weights = self.weights.copy()
+        board.version = self.version
+        return board
+
+    def merge(self, footprint: Footprint, color: List[int]) -> 'GridBoard':
+        board = self.copy()
+        board.apply(footprint, color)
+        return board
+
+    def blend(self, footprint: Footprint, color: List[int]):
+        '''areas and colors of the touched cells with the footprint
+        added block by block like Cell.add, the board is unchanged'''
+        inside = self._inside(footprint)
+        xs, ys = footprint.xs[inside], footprint.ys[inside]
+        area, rgb = composite(
+            self._areas_at(ys, xs).astype(np.float64),
+            self._colors_at(ys, xs)[:, :3].astype(np.int64),
+            footprint.contrib[:, inside], color)
+        alpha = np.where(area != 0, np.clip(area * 255, 0, 255), 255)
+        return xs, ys, area, np.column_stack([rgb, alpha]).astype(np.uint8)
+
+    def apply(self, footprint: Footprint, color: List[int]):
+        xs, ys, area, rgba = self.blend(footprint, color)
+        self.area[ys, xs] = area
+        self.color[ys, xs] = rgba
+        rows = np.unique(ys)
+        self.weights[rows] = self.area[rows].sum(axis=1, dtype=np.float64)
+        self.version += 1
+
+    def preview(self, footprint: Footprint, color: List[int]):
+        '''touched cells and their colors as if the footprint was added'''
+        xs, ys, _, rgba = self.blend(footprint, color)
+        return xs, ys, rgba
+
+    def rgba(self, top: int = 0) -> np.ndarray:
+        '''colors of the rows from top down'''
+        return self.color[top:]
+
+    def areas(self) -> np.ndarray:
+        return self.area.astype(np.float64)
+
+    def row_weights(self) -> np.ndarray:
+        return self.weights
+
+    def clear_lines(self, threshold: float) -> int:
+        full = self.row_weights() >= self.width * threshold / 100 - EPSILON
+        lines_cleared = int(full.sum())
+        if lines_cleared:
+            keep = ~full
+            self.area[lines_cleared:] = self.area[keep]
+            self.area[:lines_cleared] = 0
+            self.color[lines_cleared:] = self.color[keep]
+            self.color[:lines_cleared] = EMPTY
+            self.weights[lines_cleared:] = self.weights[keep]
+            self.weights[:lines_cleared] = 0
+            self.version += 1
+
+        return lines_cleared
+
+    def __str__(self) -> str:
+        string = ''
+        for row in self.areas().tolist():
+            string += '1.0 '
+            for area in row:
+                string += f'{round(area, 1)} '
+            string += '1.0 \n'
+        string += '1.0 ' * (self.width + 2) + '\n'
+        return string
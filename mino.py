@@ -1,40 +1,165 @@
-from shapely.geometry import box
+from shapely.geometry import Point, Polygon, box
 from shapely.ops import unary_union
-from shapely.affinity import rotate, translate
+from collections import OrderedDict
+import math
+import numpy as np
 from typing import List, Tuple
 Coord = Tuple[int, int]
+Transform = Tuple[float, float, float, float, float, float, float, float]
+# footprints a shape keeps besides the compiled ones
+MAXSIZE = 256
 
 
 class Block:
-    def __init__(self, minx: int, miny: int, maxx: int, maxy: int, density: float):
-        self.box = box(minx, miny, maxx, maxy)
+    '''unit square at x, y of density, moved by a transform
+    (a, b, d, e, rx, ry, xoff, yoff): the affine rotation shapely would
+    apply then a translation, the polygon is only built when asked for'''
+
+    __slots__ = ('x', 'y', 'density', 'transform')
+
+    def __init__(self, x: int, y: int, density: float, transform: Transform = None):
+        self.x = x
+        self.y = y
         self.density = density
+        self.transform = transform
+
+    @property
+    def corners(self) -> List[Tuple[float, float]]:
+        '''corners in the order of shapely's box'''
+        x, y = self.x, self.y
+        corners = [(x + 1, y), (x + 1, y + 1), (x, y + 1), (x, y)]
+        if self.transform is None:
+            return [(float(i), float(j)) for i, j in corners]
+        a, b, d, e, rx, ry, xoff, yoff = self.transform
+        return [(a * i + b * j + rx + xoff, d * i + e * j + ry + yoff) for i, j in corners]
+
+    @property
+    def centroid(self) -> Tuple[float, float]:
+        (x0, y0), _, (x2, y2), _ = self.corners
+        return (x0 + x2) / 2, (y0 + y2) / 2
+
+    @property
+    def box(self) -> Polygon:
+        return Polygon(self.corners)
 
     def __repr__(self):
         return str(self.box.exterior.coords.xy)
 
 
+class Shape:
+    '''blocks of a mino in spawn pose, shared by every copy of it
+    footprints are memoized by (overlap, angle, sub-cell offset), least
+    recently used first out'''
+
+    def __init__(self, coords: List[Tuple[int, int, float]], center: Coord = None, maxsize: int = MAXSIZE):
+        self.blocks = [Block(i, j, d) for i, j, d in coords]
+        self.footprints = OrderedDict()
+        self.maxsize = maxsize
+
+        if center:
+            x, y = center
+            centroid = box(x, y, x + 1, y + 1).centroid
+        else:
+            centroid = unary_union([b.box for b in self.blocks]).centroid
+        # a piece without blocks has nothing to turn around
+        self.center = (0.0, 0.0) if centroid.is_empty else (centroid.x, centroid.y)
+
+    @classmethod
+    def compiled(cls, blocks: np.ndarray, center: Tuple[float, float], footprints: dict,
+                 maxsize: int = MAXSIZE) -> 'Shape':
+        '''shape from rows of x, y, density and a known center, the
+        footprints are kept on top of maxsize others'''
+        shape = cls.__new__(cls)
+        shape.blocks = [Block(int(x), int(y), d) for x, y, d in blocks.tolist()]
+        shape.center = center
+        shape.footprints = OrderedDict(footprints)
+        shape.maxsize = maxsize + len(footprints)
+        return shape
+
+    def transform(self, angle: float, xoff: float, yoff: float) -> Transform:
+        '''rotation around the center then translation, rounded the same
+        way as shapely.affinity.rotate and translate'''
+        r = angle * math.pi / 180.0
+        cosp, sinp = math.cos(r), math.sin(r)
+        if abs(cosp) < 2.5e-16:
+            cosp = 0.0
+        if abs(sinp) < 2.5e-16:
+            sinp = 0.0
+        x0, y0 = self.center
+        return (cosp, -sinp, sinp, cosp,
+                x0 - x0 * cosp + y0 * sinp, y0 - x0 * sinp - y0 * cosp, xoff, yoff)
+
+    def blocks_at(self, angle: float, xoff: float, yoff: float) -> List[Block]:
+        transform = self.transform(angle, xoff, yoff)
+        return [Block(b.x, b.y, b.density, transform) for b in self.blocks]
+
+    def footprint(self, angle: float, xoff: float, yoff: float, overlap):
+        '''cells covered in this pose, around the (0, 0) cell'''
+        key = (type(overlap), angle, xoff, yoff)
+        if key in self.footprints:
+            self.footprints.move_to_end(key)
+            return self.footprints[key]
+
+        blocks = self.blocks_at(angle, xoff, yoff)
+        cells = set()
+        for b in blocks:
+            cx, cy = b.centroid
+            x, y = math.floor(cx), math.floor(cy)
+            for i in (-1, 0, 1):
+                for j in (-1, 0, 1):
+                    cells.add((x + j, y + i))
+
+        cells = sorted(cells)
+        xs = np.array([x for x, _ in cells], dtype=np.intp)
+        ys = np.array([y for _, y in cells], dtype=np.intp)
+        footprint = (xs, ys, overlap.contrib(blocks, xs, ys))
+
+        self.footprints[key] = footprint
+        if len(self.footprints) > self.maxsize:
+            self.footprints.popitem(last=False)
+        return footprint
+
+
 class Mino:
-    def __init__(self, name: str, coords: List[Tuple[int, int, float]], color: List[int], center: Coord = None):
+    def __init__(self, name: str, coords: List[Tuple[int, int, float]], color: List[int], center: Coord = None, shape: Shape = None):
         self.name = name
-        self.blocks = [Block(i, j, i + 1, j + 1, d) for i, j, d in coords]
         self.color = color
         self.can_fall = True
+        self.shape = shape if shape else Shape(coords, center)
+        self.angle = 0.0
+        self.x = 0.0
+        self.y = 0.0
+        self._blocks = None
 
-        if center:
-            x, y = center
-            self.center = box(x, y, x + 1, y + 1).centroid
-        else:
-            self.center = unary_union([b.box for b in self.blocks]).centroid
+    @property
+    def blocks(self) -> List[Block]:
+        if self._blocks is None:
+            self._blocks = self.shape.blocks_at(self.angle, self.x, self.y)
+        return self._blocks
+
+    @property
+    def center(self):
+        x, y = self.shape.center
+        return Point(x + self.x, y + self.y)
 
     def move(self, xoff: int, yoff: int):
-        for i, b in enumerate(self.blocks):
-            self.blocks[i].box = translate(b.box, xoff=xoff, yoff=yoff)
-        self.center = translate(self.center, xoff=xoff, yoff=yoff)
+        self.x += xoff
+        self.y += yoff
+        self._blocks = None
 
     def rotate(self, angle: float):
-        for i, b in enumerate(self.blocks):
-            self.blocks[i].box = rotate(b.box, angle, origin=self.center)
+        self.angle = (self.angle + angle) % 360
+        self._blocks = None
+
+    def footprint(self, overlap, x: float = None, y: float = None):
+        '''cached footprint of the current pose shifted to its position,
+        or to x, y'''
+        x = round(self.x if x is None else x, 6)
+        y = round(self.y if y is None else y, 6)
+        ix, iy = math.floor(x), math.floor(y)
+        xs, ys, contrib = self.shape.footprint(
+            round(self.angle, 6), round(x - ix, 6), round(y - iy, 6), overlap)
+        return xs + ix, ys + iy, contrib
 
     def __repr__(self) -> str:
         return self.name
@@ -0,0 +1,253 @@
+from mino import MAXSIZE, Mino, Shape
+from overlap import OVERLAPS
+from collections import deque
+import argparse
+import copy
+import itertools
+import json
+import os
+import struct
+import numpy as np
+from typing import Callable, Deque, Dict, Iterator, List, Tuple
+
+shapes: Dict[Tuple, Shape] = {}
+
+MAGIC = b'TPCS'
+VERSION = 1
+# magic, version, overlap, shapes, bytes of pieces json, angle, offset
+HEADER = struct.Struct('<4sHHIIdd')
+# first piece using it, blocks, footprints, cells of all footprints, center
+SHAPE = struct.Struct('<IIIIdd')
+# poses past the first ones of a turn are computed on demand
+MAX_TURNS = 1024
+
+
+def shape_key(blocks, center) -> Tuple:
+    return tuple(map(tuple, blocks)), tuple(center) if center else None
+
+
+def load_mino(data) -> Mino:
+    name: str = data['name']
+    color: List[int] = data['color']
+    blocks: List[Tuple[int, int, float]] = [
+        (i, j, d) for i, j, d in data['blocks']]
+
+    center = data['center'] if 'center' in data else None
+
+    key = shape_key(blocks, center)
+    if key not in shapes:
+        shapes[key] = Shape(blocks, center)
+
+    return Mino(name, blocks, color, center, shapes[key])
+
+
+def validate(data, filename: str = ''):
+    if not isinstance(data, list):
+        raise ValueError(f'{filename}: expected a list of pieces')
+    for n, m in enumerate(data):
+        where = f'{filename}: piece {n}'
+        if not isinstance(m.get('name'), str):
+            raise ValueError(f'{where}: name must be a string')
+        color = m.get('color', [])
+        if len(color) != 3 or not all(isinstance(c, int) and 0 <= c <= 255 for c in color):
+            raise ValueError(f'{where}: color must be [r, g, b] in 0-255')
+        if any(len(b) != 3 for b in m.get('blocks', [None])):
+            raise ValueError(f'{where}: blocks must be [x, y, density]')
+        if 'center' in m and len(m['center']) != 2:
+            raise ValueError(f'{where}: center must be [x, y]')
+
+
+class PieceSet:
+    '''parsed pieces file, bags are shallow copies of the templates'''
+
+    def __init__(self, data):
+        self.data = data
+        self.templates = [load_mino(m) for m in data]
+
+    def bag(self) -> List[Mino]:
+        return [copy.copy(m) for m in self.templates]
+
+
+class PieceQueue:
+    '''upcoming minos, at least lookahead of them after every pop
+    prefetch builds the next bag and warms it ahead of time so pop
+    does not have to, bags come out in the same order either way'''
+
+    def __init__(self, bag: Callable[[], List[Mino]], lookahead: int = 6,
+                 warm: Callable[[Mino], object] = None, minos: List[Mino] = None):
+        self.bag = bag
+        self.lookahead = lookahead
+        self.warm = warm
+        self.minos: Deque[Mino] = deque(minos) if minos is not None else deque(self.new_bag())
+
+    def new_bag(self) -> List[Mino]:
+        minos = self.bag()
+        if self.warm:
+            for mino in minos:
+                self.warm(mino)
+        return minos
+
+    def fill(self, n: int):
+        while len(self.minos) < n:
+            self.minos.extend(self.new_bag())
+
+    def pop(self) -> Mino:
+        mino = self.minos.popleft()
+        self.fill(self.lookahead)
+        return mino
+
+    def prefetch(self):
+        '''build bags until the next pop needs none'''
+        self.fill(self.lookahead + 1)
+
+    def peek(self, n: int) -> List[Mino]:
+        self.fill(n)
+        return list(itertools.islice(self.minos, n))
+
+    def __len__(self) -> int:
+        return len(self.minos)
+
+    def __iter__(self) -> Iterator[Mino]:
+        return iter(self.minos)
+
+
+piece_sets: Dict[str, Tuple[Tuple[int, int], PieceSet]] = {}
+
+
+def turns(step: float, period: float) -> List[float]:
+    '''values k * step wraps to in [0, period), rounded like Mino.footprint'''
+    values = {}
+    for k in range(MAX_TURNS):
+        value = round(k * step % period, 6) % period
+        if value in values:
+            break
+        values[value] = None
+    return list(values)
+
+
+def compile_pieces(piece_set: PieceSet, overlap: str = 'shapely', angle: float = 90,
+                   offset: float = 1) -> bytes:
+    '''pieces file with the blocks, center and footprints of every shape,
+    the footprints cover the poses reachable by turns of angle and moves
+    of offset with the overlap engine'''
+    engine = OVERLAPS[overlap]()
+    first = {}
+    for i, m in enumerate(piece_set.templates):
+        first.setdefault(id(m.shape), (i, m.shape))
+    data = json.dumps(piece_set.data).encode()
+    parts = [
+        HEADER.pack(MAGIC, VERSION, list(OVERLAPS).index(overlap), len(first), len(data), angle, offset),
+        data, bytes(-len(data) % 8),
+    ]
+
+    phases = turns(offset, 1)
+    poses = [(a, x, y) for a in turns(angle, 360) for x in phases for y in phases]
+    for i, shape in first.values():
+        footprints = [shape.footprint(*pose, engine) for pose in poses]
+        starts = np.cumsum([0] + [len(xs) for xs, _, _ in footprints])
+        blocks = [(b.x, b.y, b.density) for b in shape.blocks]
+        parts += [
+            SHAPE.pack(i, len(blocks), len(poses), int(starts[-1]), *shape.center),
+            np.array(blocks, '<f8').reshape(-1, 3).tobytes(),
+            np.array(poses, '<f8').tobytes(),
+            starts.astype('<i8').tobytes(),
+            np.concatenate([xs for xs, _, _ in footprints]).astype('<i8').tobytes(),
+            np.concatenate([ys for _, ys, _ in footprints]).astype('<i8').tobytes(),
+            np.concatenate([c for _, _, c in footprints], axis=1).astype('<f8').tobytes(),
+        ]
+    return b''.join(parts)
+
+
+def load_compiled(data: bytes, filename: str = '') -> PieceSet:
+    '''pieces from compile_pieces, the footprints are views of data'''
+    magic, version, overlap, count, size, _, _ = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'{filename}: not a compiled pieces file')
+    if version != VERSION:
+        raise ValueError(f'{filename}: unsupported compiled pieces version {version}')
+    overlap = OVERLAPS[list(OVERLAPS)[overlap]]
+
+    offset = HEADER.size
+    pieces = json.loads(bytes(data[offset:offset + size]))
+    validate(pieces, filename)
+    offset += size + -size % 8
+
+    def read(n: int, dtype: str) -> np.ndarray:
+        nonlocal offset
+        array = np.frombuffer(data, dtype, n, offset)
+        offset += array.nbytes
+        return array
+
+    for _ in range(count):
+        piece, n, k, cells, *center = SHAPE.unpack_from(data, offset)
+        offset += SHAPE.size
+        blocks = read(3 * n, '<f8').reshape(n, 3)
+        poses = read(3 * k, '<f8').reshape(k, 3).tolist()
+        starts = read(k + 1, '<i8').tolist()
+        xs, ys = read(cells, '<i8'), read(cells, '<i8')
+        contrib = read(n * cells, '<f8').reshape(n, cells)
+        footprints = {
+            (overlap, *pose): (xs[a:b], ys[a:b], contrib[:, a:b])
+            for pose, a, b in zip(poses, starts, starts[1:])
+        }
+
+        key = shape_key(pieces[piece]['blocks'], pieces[piece].get('center'))
+        if key in shapes:
+            shape = shapes[key]
+            shape.footprints.update(footprints)
+            shape.maxsize = max(shape.maxsize, len(footprints) + MAXSIZE)
+        else:
+            shapes[key] = Shape.compiled(blocks, tuple(center), footprints)
+
+    return PieceSet(pieces)
+
+
+def load_pieces(filename: str) -> PieceSet:
+    '''parse a pieces file once, again only if it changed on disk,
+    compiled ones are told apart by their magic'''
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    if path in piece_sets and piece_sets[path][0] == stamp:
+        return piece_sets[path][1]
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw[:len(MAGIC)] == MAGIC:
+        piece_set = load_compiled(raw, filename)
+    else:
+        data = json.loads(raw)
+        validate(data, filename)
+        piece_set = PieceSet(data)
+
+    piece_sets[path] = (stamp, piece_set)
+    return piece_set
+
+
+def parse_args(argv=None):
+    overlap = 'shapely'
+    if os.path.exists('config.json'):
+        with open('config.json') as f:
+            overlap = json.load(f)['core'].get('overlap', overlap)
+
+    parser = argparse.ArgumentParser(description='compile a pieces file with its footprints')
+    parser.add_argument('pieces')
+    parser.add_argument('--output', help='the pieces file with a .compiled extension if not given')
+    parser.add_argument('--overlap', choices=list(OVERLAPS), default=overlap)
+    parser.add_argument('--angle', type=float, default=90, help='rotation step')
+    parser.add_argument('--offset', type=float, default=1, help='movement step')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = args.output or os.path.splitext(args.pieces)[0] + '.compiled'
+    data = compile_pieces(load_pieces(args.pieces), args.overlap, args.angle, args.offset)
+    with open(output, 'wb') as f:
+        f.write(data)
+    print(f'{output}: {len(data)} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+from collections import deque
+import contextlib
+import json
+import time
+import numpy as np
+from typing import Deque, Dict, Sequence
+
+
+class Profiler:
+    '''timings of the phases of the render loop over the last window frames'''
+
+    def __init__(self, window: int = 300, percentiles: Sequence[float] = (50, 95, 99)):
+        self.window = window
+        self.percentiles = percentiles
+        self.timings: Dict[str, Deque[float]] = {}
+
+    def add(self, name: str, seconds: float):
+        if name not in self.timings:
+            self.timings[name] = deque(maxlen=self.window)
+        self.timings[name].append(seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        '''percentiles and max of each phase in ms'''
+        report = {}
+        for name, timings in self.timings.items():
+            ms = np.fromiter(timings, np.float64, len(timings)) * 1000
+            values = np.percentile(ms, self.percentiles)
+            report[name] = {f'p{p:g}': float(v) for p, v in zip(self.percentiles, values)}
+            report[name]['max'] = float(ms.max())
+            report[name]['count'] = len(ms)
+        return report
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({'window': self.window, 'phases': self.report()}, f, indent=4)
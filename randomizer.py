@@ -0,0 +1,72 @@
+from mino import Mino
+from pieces import PieceSet
+from collections import deque
+import copy
+import random
+from typing import Deque, List
+
+
+class BagRandomizer:
+    '''every piece once per bag, in shuffled order'''
+
+    def __init__(self, pieces: PieceSet, rng: random.Random):
+        self.pieces = pieces
+        self.rng = rng
+
+    def next(self) -> List[Mino]:
+        minos = self.pieces.bag()
+        self.rng.shuffle(minos)
+        return minos
+
+    def getstate(self) -> List[int]:
+        return []
+
+    def setstate(self, state: List[int]):
+        pass
+
+
+class HistoryRandomizer:
+    '''one piece at a time, drawn again up to tries times while it is
+    one of the last history pieces'''
+
+    def __init__(self, pieces: PieceSet, rng: random.Random, history: int = 4, tries: int = 4):
+        self.pieces = pieces
+        self.rng = rng
+        self.tries = tries
+        self.recent: Deque[int] = deque(maxlen=history)
+
+    def next(self) -> List[Mino]:
+        n = len(self.pieces.templates)
+        for _ in range(self.tries):
+            i = self.rng.randrange(n)
+            if i not in self.recent:
+                break
+        self.recent.append(i)
+        return [copy.copy(self.pieces.templates[i])]
+
+    def getstate(self) -> List[int]:
+        return list(self.recent)
+
+    def setstate(self, state: List[int]):
+        self.recent.clear()
+        self.recent.extend(state)
+
+
+class RandomRandomizer:
+    '''one piece at a time, each as likely'''
+
+    def __init__(self, pieces: PieceSet, rng: random.Random):
+        self.pieces = pieces
+        self.rng = rng
+
+    def next(self) -> List[Mino]:
+        return [copy.copy(self.rng.choice(self.pieces.templates))]
+
+    def getstate(self) -> List[int]:
+        return []
+
+    def setstate(self, state: List[int]):
+        pass
+
+
+RANDOMIZERS = {'bag': BagRandomizer, 'history': HistoryRandomizer, 'random': RandomRandomizer}
@@ -1,9 +1,46 @@
-from core import Core, load_mino
-from renderable import Button, InputBox, BoxManager, RenderQueue, LineStatus
+from core import Core
+from pieces import PieceSet, compile_pieces, load_mino, load_pieces
+from bot import Bot
+from simulator import COMMANDS
+from replay import ANGLED, Log
+from profiler import Profiler
+from renderable import Coord, Button, InputBox, BoxManager, RenderQueue, LineStatus, PhaseStatus, Playfield, text_cache
 import pygame
+import numpy as np
+import contextlib
+import copy
 import json
+import os
+import random
+import time
+from typing import Dict
 
 white = pygame.Color('white')
+# game logic runs in fixed steps of ms, frames are drawn at FPS
+STEP = 1000 / 240
+FPS = 60
+# longest stall caught up on, the rest is dropped
+MAX_LAG = 250
+# the only events any screen handles, the others are not queued
+EVENTS = [pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN]
+# extras that are switched with 0 or 1, the others are numbers of any length
+FLAGS = {'line status', 'autoplay', 'record', 'profile', 'ghost'}
+# move and turn steps a game starts with, the editor compiles pieces for them
+OFFSET = 1
+ANGLE = 90
+# boxes per row of the option screen, three rows of extras fit under the commands
+COLUMNS = 3
+
+
+def key_table(commands: Dict[str, str]) -> Dict[int, str]:
+    '''commands of config.json by keycode instead of key name'''
+    table = {}
+    for name, command in commands.items():
+        try:
+            table[pygame.key.key_code(name)] = command
+        except ValueError:
+            print(f'unknown key {name!r} for {command}')
+    return table
 
 
 class Game:
@@ -11,22 +48,28 @@ class Game:
         with open('config.json') as f:
             self.data = json.load(f)
 
-        self.commands = self.data['commands']
+        self.commands = key_table(self.data['commands'])
         self.extra = self.data['extra']
         print(self.extra)
-        self.core = Core(**self.data['core'])
+        seed = random.getrandbits(64)
+        self.core = Core(**self.data['core'], rng=random.Random(seed),
+                         lookahead=self.extra.get('lookahead', 6))
+        self.log = Log(seed, **self.data['core'], pieces=self.core.pieces.data,
+                       lookahead=self.core.queue.lookahead) \
+            if self.extra.get('record') else None
         self.size = size
         self.pause = False
 
-        self.arr = 3
-        self.das = 10
-        self.currend_arr = 0
-        self.current_das = 0
-
-        self.move_down = pygame.USEREVENT + 1
-        self.arr_event = pygame.event.Event(pygame.USEREVENT, arrt1='arr')
-        self.x = 0
-        pygame.time.set_timer(self.move_down, 400)
+        # ms of game time, pauses excluded
+        self.time = 0.0
+        self.das = self.extra.get('das', 333)
+        self.arr = max(self.extra.get('arr', 133), 1)
+        self.gravity = 400
+        self.held = 0.0
+        self.repeat = 0.0
+        self.fall = 0.0
+        self.bot_delay = 1000 / 30
+        self.bot_time = 0.0
 
         self.screen = screen
 
@@ -37,22 +80,22 @@ class Game:
 
         self.queue = RenderQueue(
             self.core.queue, self.size,
-            (self.offset[0] + self.core.width * self.size + 10, 100)
+            (self.offset[0] + self.core.width * self.size + 10, 100),
+            self.core.queue.lookahead
         )
         if self.extra['line status']:
             self.linestatus = LineStatus(
-                self.core.board,
+                self.core.height,
                 self.size,
                 (self.offset[0] - self.size - 10, self.offset[1])
             )
 
-        self.playfield = pygame.Surface(
-            (self.core.width*self.size, self.core.height*self.size), pygame.SRCALPHA)
+        self.playfield = Playfield(self.core.width, self.core.height, self.size)
 
-        self.font = pygame.font.SysFont('Arial', 30)
+        self.font = text_cache('Arial', 30)
 
-        self.input_offset = InputBox('offset', (150, 200), 150, 50, 1, float)
-        self.input_angle = InputBox('angle', (150, 300), 150, 50, 90, float)
+        self.input_offset = InputBox('offset', (150, 200), 150, 50, OFFSET, float)
+        self.input_angle = InputBox('angle', (150, 300), 150, 50, ANGLE, float)
         self.input_threshold = InputBox(
             'threshold', (150, 400), 150, 50, 100, float)
         self.box_manager = BoxManager(
@@ -60,18 +103,82 @@ class Game:
         )
         self.movement = ''
 
+        self.bot = Bot(self.core) if self.extra.get('autoplay') else None
+        self.plan = []
+        self.planned = -1
+
+        self.ghost_key = None
+        self.ghost_cells = None
+
+        self.profiler = Profiler() if self.extra.get('profile') else None
+        self.phasestatus = PhaseStatus((10, 10))
+
+    def phase(self, name: str):
+        return self.profiler.phase(name) if self.profiler else contextlib.nullcontext()
+
+    def command(self, name: str):
+        '''play a command with the current offset and angle, logged when recording'''
+        value = self.input_angle.get_value() if name in ANGLED else self.input_offset.get_value()
+        if self.log:
+            self.log.record(self.time, name, value, self.core)
+        COMMANDS[name](self.core, value, value)
+
+    def close(self):
+        '''write the log and the profile of the game, if any'''
+        if self.log and self.log.events:
+            os.makedirs('replays', exist_ok=True)
+            self.log.save(os.path.join('replays', time.strftime('%Y%m%d-%H%M%S') + '.replay'))
+        self.log = None
+        if self.profiler:
+            self.profiler.dump('profile.json')
+
+    def idle(self):
+        '''work done while waiting for the next frame'''
+        with self.phase('prefetch'):
+            self.core.queue.prefetch()
+
+    def ghost(self):
+        '''cells of the falling mino where a hard drop would put it,
+        computed again only when the mino or the locked board changes'''
+        core, mino = self.core, self.core.mino
+        offset = self.input_offset.get_value()
+        key = (core.board, core.board.version, mino.shape, mino.angle, mino.x, mino.y, mino.can_fall, offset)
+        if key == self.ghost_key:
+            return self.ghost_cells
+        self.ghost_key = key
+
+        self.ghost_cells = None
+        if offset > 0:
+            landed = core.drop(mino, offset) if mino.can_fall else mino
+            xs, ys, contrib = core.footprint(landed)
+            area = np.round(contrib, 1).sum(axis=0)
+            keep = (xs >= 0) & (xs < core.width) & (ys < core.height) & (area > 0)
+            colors = np.empty((int(keep.sum()), 4), np.uint8)
+            colors[:, :3] = mino.color
+            colors[:, 3] = np.clip(area[keep], 0, 1) * 96
+            self.ghost_cells = (xs[keep], ys[keep], colors)
+        return self.ghost_cells
+
+    def autoplay(self):
+        offset = self.input_offset.get_value()
+        angle = self.input_angle.get_value()
+        if offset <= 0:
+            return
+
+        if self.planned != self.core.placed:
+            self.bot.offset = offset
+            self.bot.angle = angle
+            self.plan = self.bot.plan()
+            self.planned = self.core.placed
+        if self.plan:
+            self.command(self.plan.pop(0))
+
     def handle(self, event):
-        if 'key' in dir(event) and pygame.key.name(event.key) in self.commands:
-            command = self.commands[pygame.key.name(event.key)]
-        else:
-            command = ''
+        command = self.commands.get(event.key, '') \
+            if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP else ''
         if event.type == pygame.KEYUP:
-            if command == 'left':
+            if command == self.movement:
                 self.movement = ''
-                self.current_das = 0
-            elif command == 'right':
-                self.movement = ''
-                self.current_das = 0
         elif event.type == pygame.KEYDOWN:
             if self.pause and self.box_manager.selected is not None:
                 self.box_manager.add(pygame.key.name(event.key))
@@ -90,45 +197,54 @@ class Game:
                     return 'retry'
                 return 'game'
 
-            if command == 'left':
-                self.movement = 'left'
-                self.core.move(-self.input_offset.get_value(), 0)
-                self.current_das = True
-            elif command == 'right':
-                self.movement = 'right'
-                self.core.move(self.input_offset.get_value(), 0)
-                self.current_das = True
-            elif command == 'down':
-                self.core.move(0, self.input_offset.get_value())
-            elif command == 'cw':
-                self.core.rotate(-self.input_angle.get_value())
-            elif command == 'ccw':
-                self.core.rotate(self.input_angle.get_value())
-            elif command == 'cw2x':
-                self.core.rotate(-self.input_angle.get_value()*2)
-            elif command == 'ccw2x':
-                self.core.rotate(self.input_angle.get_value()*2)
-            elif command == 'harddrop':
-                self.core.harddrop(self.input_offset.get_value())
+            if command in ('left', 'right'):
+                self.movement = command
+                self.held = 0.0
+                self.repeat = 0.0
+                self.command(command)
+            elif command in COMMANDS:
+                self.command(command)
             elif command == 'pause':
                 self.pause = True
 
-        elif event == self.arr_event:
-            if self.movement == 'left':
-                self.core.move(-self.input_offset.get_value(), 0)
-            elif self.movement == 'right':
-                self.core.move(self.input_offset.get_value(), 0)
         elif event.type == pygame.MOUSEBUTTONDOWN and self.pause:
             self.box_manager.set_selected()
 
-        elif event.type == self.move_down and (self.pause == False and self.core.end == False):
-            self.core.move(0, self.input_offset.get_value())
-
         if not self.pause:
-            self.core.threshold = self.input_threshold.get_value()
+            threshold = self.input_threshold.get_value()
+            if threshold != self.core.threshold:
+                if self.log:
+                    self.log.record(self.time, 'threshold', threshold, self.core)
+                self.core.threshold = threshold
 
         return 'game'
 
+    def update(self, dt: float):
+        '''advance gravity, auto shift and autoplay by dt ms'''
+        if self.pause or self.core.end:
+            return
+        self.time += dt
+
+        if self.movement:
+            self.held += dt
+            if self.held >= self.das:
+                self.repeat += dt
+                while self.repeat >= self.arr:
+                    self.repeat -= self.arr
+                    self.command(self.movement)
+
+        self.fall += dt
+        while self.fall >= self.gravity:
+            self.fall -= self.gravity
+            self.command('gravity')
+
+        if self.bot:
+            self.bot_time += dt
+            while self.bot_time >= self.bot_delay:
+                self.bot_time -= self.bot_delay
+                with self.phase('autoplay'):
+                    self.autoplay()
+
     def render(self):
         def render_text(screen, text: str, x: int, y: int):
             text = self.font.render(
@@ -138,29 +254,18 @@ class Game:
 
         self.screen.fill((0, 0, 0))
         self.box_manager.render(self.screen)
-        self.queue.render(self.screen)
-
-        if self.current_das:
-            self.current_das += 1
-        if self.current_das > self.das:
-            self.currend_arr += 1
-        if self.currend_arr > self.arr:
-            self.currend_arr = 0
-            pygame.event.post(self.arr_event)
-
-        board = self.core.merge(self.core.mino)
-        if board is None:
-            board = self.core.board
-
-        for row in board[:-1]:
-            for cell in row[1:-1]:
-                xy = [(i * self.size, j * self.size) for i, j in cell.xy]
-                pygame.draw.polygon(self.playfield, cell.get_color(), xy)
+        with self.phase('queue'):
+            self.queue.render(self.screen)
 
         if self.extra['line status']:
-            self.linestatus.render(self.screen, self.core.board)
+            with self.phase('line status'):
+                self.linestatus.render(self.screen, self.core.board.row_weights())
 
-        self.screen.blit(self.playfield, self.offset)
+        with self.phase('preview'):
+            preview = self.core.preview(self.core.mino)
+            ghost = self.ghost() if self.extra.get('ghost') else None
+        with self.phase('playfield'):
+            self.playfield.render(self.screen, self.offset, self.core.board, preview, ghost)
 
         render_text(self.screen,
                     f'{int(self.core.points):0>10}',
@@ -174,6 +279,9 @@ class Game:
             render_text(self.screen, 'Pause',
                         self.screen.get_width() // 2, self.screen.get_height()//2)
 
+        if self.profiler:
+            self.phasestatus.render(self.screen, self.profiler)
+
 
 class Option:
     def __init__(self, screen):
@@ -196,22 +304,16 @@ class Option:
 
         self.commands = []
         for i, (key, command) in enumerate(self.data['commands'].items()):
-            if i % 2 == 0:
-                pos = (center[0] - 100, 200 + i // 2 * 50)
-            else:
-                pos = (center[0] + 100, 200 + i // 2 * 50)
+            pos = self.cell(center[0], 200, i)
             self.commands.append(InputBox(command, pos, 200, 50, key, str, 1))
-            height = 200 + i // 2 * 50 + 50
+        top = 200 + self.rows(len(self.commands)) * 50
 
         self.extra = []
         for i, (key, value) in enumerate(self.data['extra'].items()):
-            if i % 2 == 0:
-                pos = (center[0] - 100, height + i // 2 * 50)
-            else:
-                pos = (center[0] + 100, height + i // 2 * 50)
+            pos = self.cell(center[0], top, i)
             self.extra.append(
-                InputBox(str(key), pos, 200, 50, str(value), int, 1))
-            height = height + i // 2 * 50 + 50
+                InputBox(str(key), pos, 200, 50, str(value), int, 1 if key in FLAGS else 0))
+        height = top + self.rows(len(self.extra)) * 50
 
         self.box_manager = BoxManager(
             [self.input_width, self.input_height, self.input_file, *self.commands, *self.extra])
@@ -221,9 +323,19 @@ class Option:
         self.button_back = Button(
             'Back', (center[0] + 100, height), 150, 50, white)
 
+    @staticmethod
+    def cell(x: int, top: int, i: int) -> Coord:
+        '''center of the i-th box of a grid of COLUMNS boxes 200 wide'''
+        return (x + (i % COLUMNS) * 200 - (COLUMNS - 1) * 100, top + i // COLUMNS * 50)
+
+    @staticmethod
+    def rows(n: int) -> int:
+        return -(-n // COLUMNS)
+
     def load_config(self):
         data = {
             'core': {
+                **self.data['core'],
                 'width': self.input_width.get_value(),
                 'height': self.input_height.get_value(),
                 'filename': self.input_file.get_value()
@@ -261,6 +373,8 @@ class Option:
 class Edit:
     def __init__(self, screen):
         self.screen = screen
+        with open('config.json') as f:
+            self.overlap = json.load(f)['core'].get('overlap', 'shapely')
 
         width = self.screen.get_width()
         height = self.screen.get_height()
@@ -298,6 +412,7 @@ class Edit:
 
         self.density_matrix = [
             [0 for _ in range(self.buttons)] for _ in range(self.buttons)]
+        self.colors = None
 
         self._load()
         self.queue = RenderQueue(
@@ -316,10 +431,9 @@ class Edit:
 
     def _load(self):
         try:
-            with open(self.input_file.get_value() + '.json', 'r') as f:
-                self.data = json.load(f)
-
-            self.pieces = [load_mino(m) for m in self.data]
+            piece_set = load_pieces(self.input_file.get_value() + '.json')
+            self.data = copy.deepcopy(piece_set.data)
+            self.pieces = piece_set.bag()
         except FileNotFoundError:
             self.pieces = []
 
@@ -349,9 +463,9 @@ class Edit:
                 new = {
                     'name': self.input_name.get_value(),
                     'color': [
-                        min(self.input_r.get_value(), 255),
-                        min(self.input_g.get_value(), 255),
-                        min(self.input_b.get_value(), 255)
+                        max(0, min(self.input_r.get_value(), 255)),
+                        max(0, min(self.input_g.get_value(), 255)),
+                        max(0, min(self.input_b.get_value(), 255))
                     ],
                     'blocks': [(i, j, d) for i, row in enumerate(self.density_matrix) for j, d in enumerate(row) if d != 0]
                 }
@@ -359,8 +473,11 @@ class Edit:
                 self.pieces[self.queue.selected] = load_mino(new)
                 self.queue.queue = self.pieces
             elif self.button_confirm.ispressed(event):
-                with open(self.input_file.get_value() + '.json', 'w') as f:
+                name = self.input_file.get_value()
+                with open(name + '.json', 'w') as f:
                     json.dump(self.data, f)
+                with open(name + '.compiled', 'wb') as f:
+                    f.write(compile_pieces(PieceSet(self.data), self.overlap, ANGLE, OFFSET))
             elif self.button_add.ispressed(event):
                 self.queue.set_lenght(self.queue.lenght + 1)
                 empty = {'name': '', 'color': [0, 0, 0], 'blocks': []}
@@ -386,19 +503,25 @@ class Edit:
         self.box_manager.render(self.screen)
         self.button_load.render(self.screen)
         self.button_new.render(self.screen)
-        for i, row in enumerate(self.density_matrix):
-            for j, density in enumerate(row):
-                if density == 0:
-                    color = [20, 20, 20]
-                else:
-                    color = [
-                        min(self.input_r.get_value(), 255),
-                        min(self.input_g.get_value(), 255),
-                        min(self.input_b.get_value(), 255),
-                        min(density * 255, 255)
-                    ]
-                self.button_matrix[i][j].set_color(color)
-                self.button_matrix[i][j].render(self.screen)
+        density = np.array(self.density_matrix, np.float64)
+        colors = np.empty((*density.shape, 4))
+        colors[:] = [
+            max(0, min(self.input_r.get_value(), 255)),
+            max(0, min(self.input_g.get_value(), 255)),
+            max(0, min(self.input_b.get_value(), 255)),
+            0
+        ]
+        colors[..., 3] = np.minimum(density * 255, 255)
+        colors[density == 0] = (20, 20, 20, 255)
+        # only buttons whose color changed are filled again
+        changed = np.ones(density.shape, bool) if self.colors is None else \
+            (colors != self.colors).any(axis=-1)
+        for i, j in zip(*np.nonzero(changed)):
+            self.button_matrix[i][j].set_color(colors[i, j].tolist())
+        self.colors = colors
+        for row in self.button_matrix:
+            for button in row:
+                button.render(self.screen)
         self.button_back.render(self.screen)
         self.button_confirm.render(self.screen)
         self.button_add.render(self.screen)
@@ -446,42 +569,93 @@ class Menu:
 
 
 class Render:
+    '''runs the screens, input is polled and the game logic stepped
+    between frames as well so a key waits at most one step'''
+
     def __init__(self, width: int, height: int):
         pygame.init()
         pygame.display.set_caption('Tetris')
-        screen = pygame.display.set_mode((width, height))
-        self.clock = pygame.time.Clock()
-
-        current = Menu(screen)
-        current_render = 'menu'
-
-        running = True
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-                next_render = current.handle(event)
-                if current_render != next_render:
-                    if next_render == 'menu':
-                        current = Menu(screen)
-                    elif next_render == 'game':
-                        current = Game(screen, 20)
-                    elif next_render == 'retry':
-                        current = Game(screen, 20)
-                        next_render = 'game'
-                    elif next_render == 'option':
-                        current = Option(screen)
-                    elif next_render == 'edit':
-                        current = Edit(screen)
-                    elif next_render == 'quit':
-                        running = False
-                current_render = next_render
-
-            current.render()
-
-            pygame.display.update()
-            self.clock.tick(30)
+        self.screen = pygame.display.set_mode((width, height))
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(EVENTS)
+
+        self.current = Menu(self.screen)
+        self.current_render = 'menu'
+        self.running = True
+        self.lag = 0.0
+        self.last = time.perf_counter()
+
+        next_frame = self.last
+        while self.running:
+            self.poll()
+            self.step()
+            now = time.perf_counter()
+            if now >= next_frame:
+                self.draw()
+                next_frame = max(next_frame + 1 / FPS, now)
+            else:
+                if self.current_render == 'game':
+                    self.current.idle()
+                time.sleep(max(min(next_frame - time.perf_counter(), STEP / 1000), 0))
+
+        if self.current_render == 'game':
+            self.current.close()
+
+    @property
+    def profiler(self):
+        return self.current.profiler if self.current_render == 'game' else None
+
+    def poll(self):
+        profiler = self.profiler
+        start = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+
+            next_render = self.current.handle(event)
+            if self.current_render == 'game' and next_render != 'game':
+                self.current.close()
+            if self.current_render != next_render:
+                if next_render == 'menu':
+                    self.current = Menu(self.screen)
+                elif next_render == 'game':
+                    self.current = Game(self.screen, 20)
+                elif next_render == 'retry':
+                    self.current = Game(self.screen, 20)
+                    next_render = 'game'
+                elif next_render == 'option':
+                    self.current = Option(self.screen)
+                elif next_render == 'edit':
+                    self.current = Edit(self.screen)
+                elif next_render == 'quit':
+                    self.running = False
+            self.current_render = next_render
+
+        if profiler:
+            profiler.add('handle', time.perf_counter() - start)
+
+    def step(self):
+        '''run the logic steps due since the last call'''
+        now = time.perf_counter()
+        self.lag = min(self.lag + (now - self.last) * 1000, MAX_LAG)
+        self.last = now
+
+        profiler = self.profiler
+        with profiler.phase('logic') if profiler and self.lag >= STEP else contextlib.nullcontext():
+            while self.lag >= STEP:
+                if self.current_render == 'game':
+                    self.current.update(STEP)
+                self.lag -= STEP
+
+    def draw(self):
+        profiler = self.profiler
+        with profiler.phase('render') if profiler else contextlib.nullcontext():
+            self.current.render()
+
+        start = time.perf_counter()
+        pygame.display.update()
+        if profiler:
+            profiler.add('update', time.perf_counter() - start)
 
 
 if __name__ == '__main__':
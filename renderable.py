@@ -1,9 +1,43 @@
+from grid import EMPTY
 import pygame
-from cell import Cell
-from typing import Tuple, List
+import numpy as np
+from collections import OrderedDict
+import itertools
+from typing import Dict, Tuple, List
 Coord = Tuple[int, int]
 
 
+class TextCache:
+    '''font whose rendered surfaces are kept by text and color,
+    the surfaces are shared so they must not be drawn on'''
+
+    def __init__(self, name: str, size: int, maxsize: int = 1024):
+        self.font = pygame.font.SysFont(name, size)
+        self.surfaces = OrderedDict()
+        self.maxsize = maxsize
+
+    def render(self, text: str, antialias: bool, color):
+        key = (text, antialias, tuple(color))
+        if key in self.surfaces:
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+
+        surface = self.font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+text_caches: Dict[Tuple[str, int], TextCache] = {}
+
+
+def text_cache(name: str, size: int) -> TextCache:
+    if (name, size) not in text_caches:
+        text_caches[name, size] = TextCache(name, size)
+    return text_caches[name, size]
+
+
 class Input:
     def __init__(self, name: str, center: Coord, width: int, height: int, color: List[int], text_color: List[int]):
         self.name = name
@@ -15,7 +49,7 @@ class Input:
         self.position = (
             center[0] - width / 2, center[1] - height / 2
         )
-        self.font = pygame.font.SysFont('Arial', 20)
+        self.font = text_cache('Arial', 20)
         self.text_color = text_color
         self.text = self.font.render(name, True, text_color)
 
@@ -123,27 +157,110 @@ class BoxManager:
 
 
 class LineStatus:
-    def __init__(self, board: List, size: int, pos: Coord):
+    def __init__(self, height: int, size: int, pos: Coord):
         self.size = size
         self.pos = pos
-        self.font = pygame.font.SysFont('Arial', 15)
+        self.font = text_cache('Arial', 15)
         self.weights = [
-            pygame.Surface((size, size)) for _ in board[:-1]
+            pygame.Surface((size, size)) for _ in range(height)
         ]
-
-    def render(self, screen, board):
-        for i, row in enumerate(board[:-1]):
-            self.weights[i].fill((0, 0, 0))
-            weight = sum([c.area for c in row[1:-1]])
-            text = self.font.render(
-                str(round(weight, 1)), True, (255, 255, 255))
-            self.weights[i].blit(text, (0, 0))
+        self.texts = [None] * height
+
+    def render(self, screen, weights: List[float]):
+        for i, weight in enumerate(weights):
+            string = str(round(weight, 1))
+            if string != self.texts[i]:
+                self.texts[i] = string
+                self.weights[i].fill((0, 0, 0))
+                text = self.font.render(string, True, (255, 255, 255))
+                self.weights[i].blit(text, (0, 0))
             screen.blit(
                 self.weights[i],
                 (self.pos[0], self.pos[1] + i * self.size)
             )
 
 
+class PhaseStatus:
+    '''table of the profiler report, refreshed every few frames'''
+
+    def __init__(self, pos: Coord, every: int = 15):
+        self.pos = pos
+        self.every = every
+        self.frames = 0
+        self.font = text_cache('Arial', 14)
+        self.lines = []
+
+    def render(self, screen, profiler):
+        if self.frames % self.every == 0:
+            self.lines = [
+                f'{name:<12} ' + ' '.join(f'{k} {v:.2f}' for k, v in stats.items() if k != 'count')
+                for name, stats in profiler.report().items()
+            ]
+        self.frames += 1
+
+        for i, line in enumerate(self.lines):
+            text = self.font.render(line, True, (255, 255, 0))
+            screen.blit(text, (self.pos[0], self.pos[1] + i * text.get_height()))
+
+
+class Playfield:
+    '''retained board surface, only cells whose color changed since the
+    last frame are filled again, the falling mino and its ghost are drawn
+    over it and restored from the cached colors when they move'''
+
+    def __init__(self, width: int, height: int, size: int):
+        self.size = size
+        self.surface = pygame.Surface((width * size, height * size), pygame.SRCALPHA)
+        self.surface.fill(EMPTY)
+        self.colors = np.empty((height, width, 4), np.uint8)
+        self.colors[:] = EMPTY
+        # rows above top are empty on the surface
+        self.top = height
+        self.board = None
+        self.version = None
+        self.overlay = []
+        self.square = pygame.Surface((size, size), pygame.SRCALPHA)
+
+    def fill(self, x: int, y: int, color):
+        self.surface.fill(color, (x * self.size, y * self.size, self.size, self.size))
+
+    def update(self, board):
+        if board is self.board and board.version == self.version:
+            return
+        self.board = board
+        self.version = board.version
+
+        # rows above both tops are empty on the surface and on the board
+        top = min(board.top, self.top)
+        colors = board.rgba(top)
+        for y, x in np.argwhere((colors != self.colors[top:]).any(axis=2)).tolist():
+            self.fill(x, y + top, colors[y, x])
+        self.colors[top:] = colors
+        self.top = board.top
+
+    def render(self, screen, pos: Coord, board, preview=None, ghost=None):
+        self.update(board)
+
+        for x, y in self.overlay:
+            self.fill(x, y, self.colors[y, x])
+        self.overlay = []
+
+        if ghost is not None:
+            xs, ys, colors = ghost
+            for x, y, color in zip(xs.tolist(), ys.tolist(), colors.tolist()):
+                self.square.fill(color)
+                self.surface.blit(self.square, (x * self.size, y * self.size))
+                self.overlay.append((x, y))
+
+        if preview is not None:
+            xs, ys, colors = preview
+            for x, y, color in zip(xs.tolist(), ys.tolist(), colors):
+                self.fill(x, y, color)
+                self.overlay.append((x, y))
+
+        screen.blit(self.surface, pos)
+
+
 class BoxQueue:
     def __init__(self, box_size: int, size: int, pos: Coord):
         self.box_size = box_size
@@ -162,7 +279,7 @@ class BoxQueue:
                 self.box,
                 color,
                 [(i * self.size, j * self.size)
-                 for i, j in block.box.exterior.coords]
+                 for i, j in block.corners]
             )
         self.screen_area = screen.blit(self.box, self.pos)
 
@@ -197,5 +314,5 @@ class RenderQueue:
         ]
 
     def render(self, screen):
-        for i, mino in enumerate(self.queue[:self.lenght]):
+        for i, mino in enumerate(itertools.islice(self.queue, self.lenght)):
             self.boxes[i].render(screen, mino)
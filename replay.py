@@ -0,0 +1,256 @@
+from core import Core
+from pieces import PieceSet, validate
+from simulator import COMMANDS
+from snapshot import dumps, loads
+import argparse
+import bisect
+import json
+import random
+import struct
+import time
+from typing import BinaryIO, List, NamedTuple
+
+MAGIC = b'TRPL'
+VERSION = 1
+# magic, version, seed, width, height, lookahead
+HEADER = struct.Struct('<4sBQHHH')
+LENGTH = struct.Struct('<I')
+# time in ms since the start, command code, offset or angle it was played with
+EVENT = struct.Struct('<IBd')
+
+CODES = [*COMMANDS, 'threshold']
+ANGLED = {'cw', 'ccw', 'cw2x', 'ccw2x'}
+
+
+class Event(NamedTuple):
+    time: int
+    code: int
+    value: float
+
+
+def apply(core: Core, event: Event):
+    name = CODES[event.code]
+    if name == 'threshold':
+        core.threshold = event.value
+    else:
+        COMMANDS[name](core, event.value, event.value)
+
+
+class Checkpoint(NamedTuple):
+    # events applied before it, snapshot of the game then
+    index: int
+    data: bytes
+
+
+class Log:
+    '''seed and rules of a game and the timed commands played in it,
+    enough to play it again move for move, with a snapshot of the game
+    every interval ms of play so a seek need not start from the beginning'''
+
+    def __init__(self, seed: int, width: int, height: int, filename: str, backend: str = 'cells',
+                 overlap: str = 'shapely', pieces: list = None, events: List[Event] = None,
+                 randomizer: str = 'bag', lookahead: int = 6, checkpoints: List[Checkpoint] = None,
+                 interval: int = 10000):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.filename = filename
+        self.backend = backend
+        self.overlap = overlap
+        self.pieces = pieces
+        self.randomizer = randomizer
+        self.lookahead = lookahead
+        self.events = events if events else []
+        self.checkpoints = checkpoints if checkpoints else []
+        self.interval = interval
+        self.piece_set: PieceSet = None
+
+    @property
+    def duration(self) -> int:
+        return self.events[-1].time if self.events else 0
+
+    def record(self, time: int, command: str, value: float, core: Core = None):
+        '''add a command, core is the game before it and is kept as a
+        checkpoint once interval ms passed since the last one'''
+        last = self.events[self.checkpoints[-1].index].time if self.checkpoints else 0
+        if core is not None and self.events and time - last >= self.interval:
+            self.checkpoints.append(Checkpoint(len(self.events), dumps(core)))
+        self.events.append(Event(int(time), CODES.index(command), float(value)))
+
+    def core(self) -> Core:
+        '''the game as it was before the first command'''
+        if self.piece_set is None and self.pieces is not None:
+            self.piece_set = PieceSet(self.pieces)
+        core = Core(self.width, self.height, self.filename, self.backend, self.overlap,
+                    random.Random(self.seed), self.piece_set, self.lookahead,
+                    self.randomizer)
+        self.piece_set = core.pieces
+        return core
+
+    def write(self, f: BinaryIO):
+        f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.width, self.height, self.lookahead))
+        pieces = json.dumps(self.pieces, separators=(',', ':')) if self.pieces is not None else ''
+        for text in (self.filename, self.backend, self.overlap, pieces, self.randomizer):
+            data = text.encode()
+            f.write(LENGTH.pack(len(data)) + data)
+        f.write(LENGTH.pack(len(self.events)))
+        f.write(b''.join(EVENT.pack(*e) for e in self.events))
+        f.write(LENGTH.pack(len(self.checkpoints)))
+        for index, data in self.checkpoints:
+            f.write(LENGTH.pack(index) + LENGTH.pack(len(data)) + data)
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> 'Log':
+        magic, version, seed, width, height, lookahead = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError('not a replay file')
+        if version != VERSION:
+            raise ValueError(f'unsupported replay version {version}')
+
+        texts = []
+        for _ in range(5):
+            n, = LENGTH.unpack(f.read(LENGTH.size))
+            texts.append(f.read(n).decode())
+        filename, backend, overlap, pieces, randomizer = texts
+        pieces = json.loads(pieces) if pieces else None
+        if pieces is not None:
+            validate(pieces, filename)
+
+        n, = LENGTH.unpack(f.read(LENGTH.size))
+        events = [Event(*e) for e in EVENT.iter_unpack(f.read(n * EVENT.size))]
+        checkpoints = []
+        n, = LENGTH.unpack(f.read(LENGTH.size))
+        for _ in range(n):
+            index, size = struct.unpack('<2I', f.read(2 * LENGTH.size))
+            checkpoints.append(Checkpoint(index, f.read(size)))
+        return cls(seed, width, height, filename, backend, overlap, pieces, events, randomizer, lookahead,
+                   checkpoints)
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            self.write(f)
+
+    @classmethod
+    def load(cls, path: str) -> 'Log':
+        with open(path, 'rb') as f:
+            return cls.read(f)
+
+
+class Player:
+    '''plays a log again through Core, a seek starts from the closest
+    checkpoint of the log, past the last one a snapshot of the game is
+    kept every interval ms of play on the way'''
+
+    def __init__(self, log: Log, interval: int = 10000):
+        self.log = log
+        self.interval = interval
+        self.times = [e.time for e in log.events]
+        self.core = log.core()
+        self.index = 0
+        # events applied before each checkpoint, with a snapshot of the game then
+        self.indices = [0] + [c.index for c in log.checkpoints]
+        self.checkpoints = [dumps(self.core)] + [c.data for c in log.checkpoints]
+
+    def advance(self, target: int):
+        '''apply the events up to index target'''
+        events = self.log.events
+        while self.index < target:
+            last = self.indices[-1]
+            if self.index > last and self.times[self.index] - self.times[last] >= self.interval:
+                self.indices.append(self.index)
+                self.checkpoints.append(dumps(self.core))
+            apply(self.core, events[self.index])
+            self.index += 1
+
+    def seek(self, t: int) -> Core:
+        '''the game after every command played up to t ms'''
+        target = bisect.bisect_right(self.times, t)
+        n = bisect.bisect_right(self.indices, target) - 1
+        if not self.indices[n] <= self.index <= target:
+            self.index = self.indices[n]
+            self.core = loads(self.checkpoints[n], self.log.piece_set, self.log.filename, self.log.overlap)
+        self.advance(target)
+        return self.core
+
+
+def view(player: Player, start: int = 0, speed: float = 1, size: int = 20):
+    '''watch the replay, left and right arrows seek by 10 s'''
+    import pygame
+    from renderable import Playfield, text_cache
+
+    log = player.log
+    pygame.init()
+    pygame.display.set_caption('Tetris replay')
+    screen = pygame.display.set_mode(
+        (log.width * size + 2 * size, log.height * size + 4 * size))
+    clock = pygame.time.Clock()
+    playfield = Playfield(log.width, log.height, size)
+    font = text_cache('Arial', 20)
+
+    position = start
+    last = pygame.time.get_ticks()
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                    running = False
+                elif event.key == pygame.K_LEFT:
+                    position = max(position - 10000, 0)
+                elif event.key == pygame.K_RIGHT:
+                    position += 10000
+
+        now = pygame.time.get_ticks()
+        position = min(position + (now - last) * speed, log.duration)
+        last = now
+        core = player.seek(int(position))
+
+        screen.fill((0, 0, 0))
+        playfield.render(screen, (size, 3 * size), core.board, core.preview(core.mino))
+        text = font.render(f'{int(core.points):0>10}  {position / 1000:.1f}s', True, (255, 255, 255))
+        screen.blit(text, (size, size))
+        pygame.display.update()
+        clock.tick(30)
+
+    pygame.quit()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='play a recorded game again')
+    parser.add_argument('replay')
+    parser.add_argument('--seek', type=float, default=None,
+                        help='seconds into the game, the end if not given')
+    parser.add_argument('--interval', type=float, default=10,
+                        help='seconds of play between checkpoints past the last one of the file')
+    parser.add_argument('--view', action='store_true',
+                        help='watch it from --seek instead of printing the result')
+    parser.add_argument('--speed', type=float, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log = Log.load(args.replay)
+    player = Player(log, int(args.interval * 1000))
+    t = log.duration if args.seek is None else int(args.seek * 1000)
+
+    if args.view:
+        view(player, 0 if args.seek is None else t, args.speed)
+        return
+
+    start = time.perf_counter()
+    core = player.seek(t)
+    print(json.dumps({
+        'time': t / 1000,
+        'points': core.points,
+        'lines': core.lines,
+        'placed': core.placed,
+        'top_out': core.end,
+        'seconds': round(time.perf_counter() - start, 3),
+    }))
+
+
+if __name__ == '__main__':
+    main()
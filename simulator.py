@@ -0,0 +1,82 @@
+from core import Core
+import random
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence
+
+Command = Callable[[Core, float, float], None]
+
+COMMANDS: Dict[str, Command] = {
+    'left': lambda core, offset, angle: core.move(-offset, 0),
+    'right': lambda core, offset, angle: core.move(offset, 0),
+    'down': lambda core, offset, angle: core.move(0, offset),
+    'cw': lambda core, offset, angle: core.rotate(-angle),
+    'ccw': lambda core, offset, angle: core.rotate(angle),
+    'cw2x': lambda core, offset, angle: core.rotate(-angle * 2),
+    'ccw2x': lambda core, offset, angle: core.rotate(angle * 2),
+    'harddrop': lambda core, offset, angle: core.harddrop(offset),
+    'gravity': lambda core, offset, angle: core.move(0, offset),
+}
+
+
+class StepResult(NamedTuple):
+    points: float
+    lines: int
+    placed: int
+    end: bool
+
+
+class Simulator:
+    '''one game driven by explicit commands, gravity included,
+    without pygame or wall-clock timers'''
+
+    def __init__(self, width: int, height: int, filename: str, backend: str = 'grid', overlap: str = 'raster',
+                 offset: float = 1, angle: float = 90, threshold: float = 100, randomizer: str = 'bag'):
+        self.width = width
+        self.height = height
+        self.filename = filename
+        self.backend = backend
+        self.overlap = overlap
+        self.offset = offset
+        self.angle = angle
+        self.threshold = threshold
+        self.randomizer = randomizer
+        self.steps = 0
+        self.core: Core = None
+        self.reset()
+
+    def reset(self, seed: int = None) -> Core:
+        self.core = Core(self.width, self.height, self.filename,
+                         self.backend, self.overlap, random.Random(seed), randomizer=self.randomizer)
+        self.core.threshold = self.threshold
+        self.steps = 0
+        return self.core
+
+    def step(self, actions: Iterable[str]) -> StepResult:
+        '''apply commands in order, stops early on top out'''
+        core = self.core
+        points, lines, placed = core.points, core.lines, core.placed
+        for action in actions:
+            if core.end:
+                break
+            COMMANDS[action](core, self.offset, self.angle)
+        self.steps += 1
+
+        return StepResult(
+            core.points - points, core.lines - lines, core.placed - placed, core.end)
+
+
+class Batch:
+    '''independent simulators advanced together'''
+
+    def __init__(self, games: int, *args, **kwargs):
+        self.games = [Simulator(*args, **kwargs) for _ in range(games)]
+
+    def reset(self, seeds: Sequence[int] = None) -> List[Core]:
+        if seeds is None:
+            seeds = [None] * len(self.games)
+        return [game.reset(seed) for game, seed in zip(self.games, seeds)]
+
+    def step(self, actions: Sequence[Iterable[str]]) -> List[StepResult]:
+        return [
+            StepResult(0, 0, 0, True) if game.core.end else game.step(action)
+            for game, action in zip(self.games, actions)
+        ]
@@ -0,0 +1,110 @@
+from core import Core, BOARDS
+from mino import Mino
+from overlap import OVERLAPS
+from pieces import PieceQueue, PieceSet
+from randomizer import RANDOMIZERS
+import copy
+import math
+import random
+import struct
+import numpy as np
+from typing import Union
+
+MAGIC = b'TSNP'
+VERSION = 1
+# magic, version, width, height, backend, bytes per area, flags, randomizer,
+# threshold, points, lines, placed, mino, queue length, lookahead, angle, x, y
+HEADER = struct.Struct('<4sHHHBBBBddIIHHHddd')
+# state of a random.Random, its gauss_next is nan when None
+RNG = struct.Struct('<625Id')
+
+END = 1
+CAN_FALL = 2
+SEEDED = 4
+
+
+def template(pieces: PieceSet, mino: Mino) -> int:
+    for i, t in enumerate(pieces.templates):
+        if t.shape is mino.shape and t.name == mino.name and t.color == mino.color:
+            return i
+    raise ValueError(f'{mino} is not one of the pieces of the game')
+
+
+def dumps(core: Core) -> bytes:
+    '''game state as bytes, the pieces themselves are not included
+    the board arrays follow the header as they are laid out in memory'''
+    area, color = core.board.arrays()
+    mino = core.mino
+    flags = (END if core.end else 0) | (CAN_FALL if mino.can_fall else 0) | \
+        (SEEDED if core.random is not random else 0)
+    backend = list(BOARDS.values()).index(type(core.board))
+    randomizer = list(RANDOMIZERS.values()).index(type(core.randomizer))
+    queue = [template(core.pieces, m) for m in core.queue]
+
+    header = HEADER.pack(
+        MAGIC, VERSION, core.width, core.height, backend, area.itemsize, flags, randomizer,
+        core.threshold, core.points, core.lines, core.placed,
+        template(core.pieces, mino), len(queue), core.queue.lookahead, mino.angle, mino.x, mino.y)
+    head = header + struct.pack(f'<{len(queue)}H', *queue)
+    # start the arrays on an 8 byte boundary
+    head += bytes(-len(head) % 8)
+
+    parts = [head, area.tobytes(), color.tobytes()]
+    if flags & SEEDED:
+        _, state, gauss = core.random.getstate()
+        parts.append(RNG.pack(*state, math.nan if gauss is None else gauss))
+    recent = core.randomizer.getstate()
+    parts.append(struct.pack(f'<H{len(recent)}H', len(recent), *recent))
+    return b''.join(parts)
+
+
+def loads(data: Union[bytes, bytearray, memoryview], pieces: PieceSet, filename: str = '',
+          overlap: str = 'shapely') -> Core:
+    '''game state back from dumps, the board arrays are views of data
+    when it is writable and a single copy of it otherwise'''
+    magic, version, width, height, backend, itemsize, flags, randomizer, threshold, points, lines, \
+        placed, mino, n, lookahead, angle, x, y = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a snapshot')
+    if version != VERSION:
+        raise ValueError(f'unsupported snapshot version {version}')
+
+    offset = HEADER.size
+    queue = struct.unpack_from(f'<{n}H', data, offset)
+    offset += 2 * n
+    offset += -offset % 8
+    cells = width * height
+    area = np.frombuffer(data, f'<f{itemsize}', cells, offset).reshape(height, width)
+    offset += cells * itemsize
+    color = np.frombuffer(data, np.uint8, cells * 4, offset).reshape(height, width, 4)
+    offset += cells * 4
+
+    core = Core.__new__(Core)
+    core.board = list(BOARDS.values())[backend].from_arrays(area, color)
+    core.overlap = OVERLAPS[overlap]()
+    core.filename = filename
+    core.pieces = pieces
+    core.random = random
+    if flags & SEEDED:
+        *state, gauss = RNG.unpack_from(data, offset)
+        offset += RNG.size
+        core.random = random.Random()
+        core.random.setstate((3, tuple(state), None if math.isnan(gauss) else gauss))
+    core.randomizer = list(RANDOMIZERS.values())[randomizer](pieces, core.random)
+    k, = struct.unpack_from('<H', data, offset)
+    core.randomizer.setstate(list(struct.unpack_from(f'<{k}H', data, offset + 2)))
+    core.width = width
+    core.height = height
+    core.threshold = threshold
+    core.end = bool(flags & END)
+    core.points = points
+    core.lines = lines
+    core.placed = placed
+
+    core.queue = PieceQueue(core.new_bag, lookahead, core.warm,
+                            minos=[copy.copy(pieces.templates[i]) for i in queue])
+    core.mino = copy.copy(pieces.templates[mino])
+    core.mino.move(x, y)
+    core.mino.rotate(angle)
+    core.mino.can_fall = bool(flags & CAN_FALL)
+    return core
@@ -0,0 +1,126 @@
+from board import Footprint
+from grid import EMPTY, EPSILON, GridBoard
+import numpy as np
+from typing import List
+
+
+class SparseBoard(GridBoard):
+    '''GridBoard holding only the rows from the highest occupied one down,
+    the empty rows above top take no memory and are never visited
+
+    area, color and weights are the rows top to height - 1'''
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.top = height
+        self.area = np.zeros((0, width), np.float32)
+        self.color = np.empty((0, width, 4), np.uint8)
+        self.weights = np.zeros(0)
+        self.version = 0
+
+    @classmethod
+    def from_arrays(cls, area: np.ndarray, color: np.ndarray) -> 'SparseBoard':
+        height, width = area.shape
+        board = cls(width, height)
+        occupied = np.flatnonzero(area.any(axis=1))
+        if len(occupied):
+            board.top = int(occupied[0])
+            board.area = area[board.top:].copy()
+            board.color = color[board.top:].copy()
+            board.weights = board.area.sum(axis=1, dtype=np.float64)
+        return board
+
+    def arrays(self):
+        return self.areas().astype(np.float32), self.rgba()
+
+    def copy(self) -> 'SparseBoard':
+        board = SparseBoard.__new__(SparseBoard)
+        board.width = self.width
+        board.height = self.height
+        board.top = self.top
+        board.area = self.area.copy()
+        board.color = self.color.copy()
+        board.weights = self.weights.copy()
+        board.version = self.version
+        return board
+
+    def _areas_at(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        rows = ys - self.top
+        if not len(self.area):
+            return np.zeros(rows.shape, np.float32)
+        return np.where(rows >= 0, self.area[np.maximum(rows, 0), xs], np.float32(0))
+
+    def _colors_at(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        rows = ys - self.top
+        if not len(self.area):
+            return np.tile(np.array(EMPTY, np.uint8), (*rows.shape, 1))
+        return np.where((rows >= 0)[..., None], self.color[np.maximum(rows, 0), xs],
+                        np.array(EMPTY, np.uint8))
+
+    def grow(self, top: int):
+        '''materialize the empty rows from top down to the current top'''
+        if top >= self.top:
+            return
+        n = self.top - top
+        color = np.empty((n, self.width, 4), np.uint8)
+        color[:] = EMPTY
+        self.area = np.concatenate([np.zeros((n, self.width), np.float32), self.area])
+        self.color = np.concatenate([color, self.color])
+        self.weights = np.concatenate([np.zeros(n), self.weights])
+        self.top = top
+
+    def apply(self, footprint: Footprint, color: List[int]):
+        xs, ys, area, rgba = self.blend(footprint, color)
+        touched = ys[area != 0]
+        if len(touched):
+            self.grow(int(touched.min()))
+        # cells above top that stay empty need no writing
+        keep = ys >= self.top
+        xs, ys, area, rgba = xs[keep], ys[keep] - self.top, area[keep], rgba[keep]
+        self.area[ys, xs] = area
+        self.color[ys, xs] = rgba
+        rows = np.unique(ys)
+        self.weights[rows] = self.area[rows].sum(axis=1, dtype=np.float64)
+        self.version += 1
+
+    def rgba(self, top: int = 0) -> np.ndarray:
+        '''colors of the rows from top down'''
+        color = np.empty((self.height - top, self.width, 4), np.uint8)
+        empty = max(self.top - top, 0)
+        color[:empty] = EMPTY
+        color[empty:] = self.color[max(top - self.top, 0):]
+        return color
+
+    def areas(self) -> np.ndarray:
+        area = np.zeros((self.height, self.width))
+        area[self.top:] = self.area
+        return area
+
+    def row_weights(self) -> np.ndarray:
+        weights = np.zeros(self.height)
+        weights[self.top:] = self.weights
+        return weights
+
+    def clear_lines(self, threshold: float) -> int:
+        limit = self.width * threshold / 100 - EPSILON
+        if limit <= 0:
+            # empty rows count as full too, like on GridBoard
+            self.top = self.height
+            self.area = self.area[:0]
+            self.color = self.color[:0]
+            self.weights = self.weights[:0]
+            self.version += 1
+            return self.height
+
+        full = self.weights >= limit
+        lines_cleared = int(full.sum())
+        if lines_cleared:
+            keep = ~full
+            self.area = self.area[keep]
+            self.color = self.color[keep]
+            self.weights = self.weights[keep]
+            self.top += lines_cleared
+            self.version += 1
+
+        return lines_cleared
@@ -0,0 +1,51 @@
+'''the autoplayer against the game it plays'''
+from batch import RandomPolicy
+from bot import Bot
+from core import BOARDS
+from simulator import COMMANDS, Simulator
+from snapshot import dumps, loads
+import numpy as np
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+class TestBot(unittest.TestCase):
+    def test_expansion_matches_the_game(self):
+        for backend in BOARDS:
+            for offset, angle in ((1, 90), (0.5, 45)):
+                with self.subTest(backend=backend, offset=offset, angle=angle):
+                    sim = Simulator(10, 20, FILENAME, backend, 'raster', offset=offset, angle=angle)
+                    sim.reset(9)
+                    policy = RandomPolicy(10)
+                    while sim.core.placed < 4 and not sim.core.end:
+                        sim.step(policy(sim))
+                    core = sim.core
+                    bot = Bot(core, offset, angle)
+                    expansion = bot.expand(np.round(core.board.areas(), 1), core.mino)
+                    self.assertTrue(expansion.commands)
+
+                    data = dumps(core)
+                    for commands, board, lines in zip(*expansion[:3]):
+                        game = loads(data, core.pieces, FILENAME, 'raster')
+                        for command in commands:
+                            COMMANDS[command](game, offset, angle)
+                        self.assertEqual(game.placed, core.placed + 1, commands)
+                        self.assertEqual(game.lines - core.lines, lines, commands)
+                        np.testing.assert_allclose(np.round(game.board.areas(), 1), board, atol=1e-9,
+                                                   err_msg=str(commands))
+
+    def test_plays_a_game(self):
+        sim = Simulator(10, 20, FILENAME, 'grid', 'raster')
+        sim.reset(11)
+        # depth 1 needs no budget, the moves do not depend on the clock
+        bot = Bot(sim.core, depth=1)
+        while sim.core.placed < 60 and not sim.core.end:
+            bot.core = sim.core
+            sim.step(bot.plan())
+        self.assertFalse(sim.core.end)
+        self.assertGreater(sim.core.lines, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+'''color blending through the RMS table, cell by cell and batched'''
+from batch import RandomPolicy
+from cell import EMPTY, RMS, Cell, composite
+from pieces import validate
+from simulator import Simulator
+import json
+import numpy as np
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+def formula(a: int, b: int) -> int:
+    return int(((a ** 2 + b ** 2) / 2) ** (1 / 2))
+
+
+class TestCell(unittest.TestCase):
+    def test_table_matches_the_formula(self):
+        expected = [[formula(a, b) for b in range(256)] for a in range(256)]
+        np.testing.assert_array_equal(RMS, expected)
+
+    def test_composite_matches_add(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            n, blocks = 12, rng.integers(1, 5)
+            area = np.round(rng.integers(0, 6, n) / 10, 1)
+            rgb = rng.integers(0, 256, (n, 3))
+            rgb[area == 0] = EMPTY
+            contrib = rng.random((blocks, n)) * (rng.random((blocks, n)) < 0.6)
+            color = rng.integers(0, 256, 3).tolist()
+
+            cells = []
+            for a, c in zip(area.tolist(), rgb.tolist()):
+                cell = Cell(0, 0, a)
+                cell.color = EMPTY if a == 0 else c
+                for x in contrib[:, len(cells)].tolist():
+                    cell.add(x, color)
+                cells.append(cell)
+
+            areas, colors = composite(area, rgb.copy(), contrib, color)
+            np.testing.assert_allclose(areas, [c.area for c in cells])
+            np.testing.assert_array_equal(colors, [c.color for c in cells])
+
+    def test_backends_shade_alike(self):
+        boards = []
+        for backend in ('cells', 'grid', 'sparse'):
+            sim = Simulator(10, 20, FILENAME, backend, 'raster', offset=0.5, angle=30)
+            sim.reset(14)
+            policy = RandomPolicy(15)
+            while sim.steps < 300 and not sim.core.end:
+                sim.step(policy(sim))
+            # alpha follows the area, which grid keeps as float32
+            boards.append(sim.core.board.rgba()[..., :3])
+        for rgb in boards[1:]:
+            np.testing.assert_array_equal(rgb, boards[0])
+
+    def test_validate_rejects_colors_outside_the_table(self):
+        with open(FILENAME) as f:
+            data = json.load(f)
+        validate(data, FILENAME)
+        for color in ([-1, 0, 0], [0, 256, 0], [0, 0, 0.5], [0, 0]):
+            with self.subTest(color=color):
+                data[0]['color'] = color
+                with self.assertRaises(ValueError):
+                    validate(data, FILENAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+'''Core.drop against moving the mino down one step at a time'''
+from batch import RandomPolicy
+from core import BOARDS, Core
+from simulator import Simulator
+import copy
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+def stepwise(core: Core, yoff: float):
+    '''the current mino moved down one yoff at a time while it fits'''
+    mino = copy.copy(core.mino)
+    while True:
+        moved = copy.copy(mino)
+        moved.move(0, yoff)
+        if not core.fits(moved):
+            return mino
+        mino = moved
+
+
+class TestDrop(unittest.TestCase):
+    def test_drop_matches_stepwise(self):
+        for backend in BOARDS:
+            for offset in (0.1, 0.3, 0.5, 1):
+                with self.subTest(backend=backend, offset=offset):
+                    sim = Simulator(10, 20, FILENAME, backend, 'raster', offset=offset, angle=30)
+                    sim.reset(1)
+                    policy = RandomPolicy(2)
+                    for _ in range(8):
+                        for _ in range(15):
+                            if not sim.core.end:
+                                sim.step(policy(sim))
+                        if sim.core.end:
+                            break
+                        dropped = sim.core.drop(sim.core.mino, offset)
+                        expected = stepwise(sim.core, offset)
+                        self.assertEqual((dropped.x, dropped.y), (expected.x, expected.y))
+                        # a fresh spawn can already overlap a full board
+                        if sim.core.fits(sim.core.mino):
+                            self.assertTrue(sim.core.fits(dropped))
+                        sim.step(['harddrop'])
+                    self.assertGreater(sim.core.placed, 0)
+
+    def test_drop_stops_at_the_floor(self):
+        for backend in BOARDS:
+            with self.subTest(backend=backend):
+                core = Core(10, 20, FILENAME, backend, 'raster', seed=1)
+                # an offset taller than the board still lands on it
+                dropped = core.drop(core.mino, 25)
+                self.assertEqual((dropped.x, dropped.y), (core.mino.x, core.mino.y))
+                dropped = core.drop(core.mino, 1)
+                self.assertTrue(core.fits(dropped))
+                below = copy.copy(dropped)
+                below.move(0, 1)
+                self.assertFalse(core.fits(below))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+'''RasterOverlap against the Shapely intersections it replaces'''
+from overlap import RasterOverlap, ShapelyOverlap
+from pieces import load_pieces
+import numpy as np
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+class TestOverlap(unittest.TestCase):
+    def test_raster_matches_shapely(self):
+        pieces = load_pieces(FILENAME)
+        xs, ys = np.meshgrid(np.arange(-3, 6), np.arange(-3, 6))
+        xs, ys = xs.ravel(), ys.ravel()
+        for mino in pieces.templates:
+            for angle in (0, 15, 30, 45, 90, 137.5):
+                for xoff, yoff in ((0, 0), (0.25, 0.5), (0.7, 0.1)):
+                    with self.subTest(name=mino.name, angle=angle, xoff=xoff, yoff=yoff):
+                        blocks = mino.shape.blocks_at(angle, xoff, yoff)
+                        raster = RasterOverlap().contrib(blocks, xs, ys)
+                        shapely = ShapelyOverlap().contrib(blocks, xs, ys)
+                        np.testing.assert_allclose(raster, shapely, atol=1e-9)
+
+    def test_coverage_adds_up_to_the_density(self):
+        pieces = load_pieces(FILENAME)
+        xs, ys = np.meshgrid(np.arange(-3, 6), np.arange(-3, 6))
+        xs, ys = xs.ravel(), ys.ravel()
+        for mino in pieces.templates:
+            with self.subTest(name=mino.name):
+                blocks = mino.shape.blocks_at(33, 0.4, 0.6)
+                contrib = RasterOverlap().contrib(blocks, xs, ys)
+                np.testing.assert_allclose(contrib.sum(axis=1), [b.density for b in blocks])
+
+    def test_empty(self):
+        self.assertEqual(RasterOverlap().contrib([], np.arange(3), np.arange(3)).shape, (0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+'''compiled pieces files against the JSON they were compiled from'''
+from batch import RandomPolicy
+from core import Core
+from overlap import OVERLAPS
+from pieces import compile_pieces, load_compiled, load_pieces, shapes
+from simulator import Simulator
+from snapshot import dumps
+import json
+import numpy as np
+import unittest
+from unittest import mock
+
+FILENAME = 'pieces.json'
+
+
+class TestCompiled(unittest.TestCase):
+    def setUp(self):
+        # every load below builds its own shapes
+        patcher = mock.patch.dict(shapes, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.plain = load_pieces(FILENAME)
+
+    def compiled(self, overlap: str = 'raster', angle: float = 90, offset: float = 1):
+        data = compile_pieces(self.plain, overlap, angle, offset)
+        shapes.clear()
+        return load_compiled(data, FILENAME)
+
+    def test_same_pieces(self):
+        compiled = self.compiled()
+        self.assertEqual(compiled.data, self.plain.data)
+        for a, b in zip(compiled.templates, self.plain.templates):
+            self.assertIsNot(a.shape, b.shape)
+            self.assertEqual((a.name, a.color), (b.name, b.color))
+            self.assertEqual(a.shape.center, b.shape.center)
+            self.assertEqual([(x.x, x.y, x.density) for x in a.shape.blocks],
+                             [(x.x, x.y, x.density) for x in b.shape.blocks])
+
+    def test_footprints_match_computed_ones(self):
+        compiled = self.compiled('raster', 45, 0.5)
+        engine = OVERLAPS['raster']()
+        for mino, plain in zip(compiled.templates, self.plain.templates):
+            self.assertEqual(len(mino.shape.footprints), 8 * 4)
+            for (_, *pose), (xs, ys, contrib) in mino.shape.footprints.items():
+                with self.subTest(name=mino.name, pose=pose):
+                    pxs, pys, pcontrib = plain.shape.footprint(*pose, engine)
+                    np.testing.assert_array_equal(xs, pxs)
+                    np.testing.assert_array_equal(ys, pys)
+                    np.testing.assert_array_equal(contrib, pcontrib)
+
+    def test_same_games(self):
+        compiled = self.compiled('raster', 30, 0.5)
+        for backend in ('cells', 'grid'):
+            with self.subTest(backend=backend):
+                games = []
+                for pieces in (self.plain, compiled):
+                    sim = Simulator(10, 20, FILENAME, backend, 'raster', offset=0.5, angle=30)
+                    sim.core = Core(10, 20, FILENAME, backend, 'raster', pieces=pieces, seed=16)
+                    policy = RandomPolicy(17)
+                    while sim.steps < 300 and not sim.core.end:
+                        sim.step(policy(sim))
+                    games.append(sim.core)
+                plain, compiled_game = games
+                self.assertGreater(plain.placed, 0)
+                self.assertEqual(dumps(compiled_game), dumps(plain))
+
+    def test_reloads_keep_the_cache_bound(self):
+        data = compile_pieces(self.plain, 'raster')
+        load_compiled(data, FILENAME)
+        sizes = {key: shape.maxsize for key, shape in shapes.items()}
+        for _ in range(3):
+            load_compiled(data, FILENAME)
+        self.assertEqual({key: shape.maxsize for key, shape in shapes.items()}, sizes)
+
+    def test_not_a_compiled_file(self):
+        with self.assertRaises(ValueError):
+            load_compiled(json.dumps(self.plain.data).encode().ljust(64), FILENAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
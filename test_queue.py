@@ -0,0 +1,48 @@
+'''the piece queue with and without prefetching'''
+from core import Core
+from pieces import PieceQueue
+from simulator import Simulator
+from snapshot import dumps, loads
+import itertools
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+class TestQueue(unittest.TestCase):
+    def test_lookahead_after_every_pop(self):
+        counter = itertools.count()
+        queue = PieceQueue(lambda: [next(counter) for _ in range(3)], lookahead=5)
+        for i in range(20):
+            self.assertEqual(queue.pop(), i)
+            self.assertGreaterEqual(len(queue), 5)
+        self.assertEqual(queue.peek(8), list(range(20, 28)))
+
+    def test_prefetch_keeps_the_order(self):
+        for lookahead in (1, 5, 9):
+            with self.subTest(lookahead=lookahead):
+                plain = Core(10, 20, FILENAME, 'grid', 'raster', lookahead=lookahead, seed=8)
+                prefetched = Core(10, 20, FILENAME, 'grid', 'raster', lookahead=lookahead, seed=8)
+                for _ in range(40):
+                    prefetched.queue.prefetch()
+                    self.assertEqual(plain.new_mino().name, prefetched.new_mino().name)
+
+    def test_snapshot_keeps_the_lookahead(self):
+        sim = Simulator(10, 20, FILENAME)
+        sim.core = Core(10, 20, FILENAME, 'grid', 'raster', lookahead=3, seed=5)
+        for _ in range(4):
+            sim.step(['harddrop'])
+        data = dumps(sim.core)
+        core = loads(data, sim.core.pieces, FILENAME, 'raster')
+        self.assertEqual(core.queue.lookahead, 3)
+        for _ in range(20):
+            if core.end:
+                break
+            sim.step(['harddrop'])
+            core.harddrop(1)
+            self.assertEqual(len(core.queue), len(sim.core.queue))
+        self.assertEqual(dumps(core), dumps(sim.core))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+'''the randomizers deal pieces from their own seeded stream'''
+from batch import RandomPolicy
+from core import Core
+from pieces import load_pieces
+from randomizer import RANDOMIZERS, BagRandomizer, HistoryRandomizer
+from simulator import Simulator
+from snapshot import dumps, loads
+import random
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+def names(core: Core, n: int):
+    return [core.new_mino().name for _ in range(n)]
+
+
+class TestRandomizer(unittest.TestCase):
+    def setUp(self):
+        self.pieces = load_pieces(FILENAME)
+        self.all = sorted(m.name for m in self.pieces.templates)
+
+    def test_bag_deals_every_piece_once(self):
+        bag = BagRandomizer(self.pieces, random.Random(1))
+        orders = set()
+        for _ in range(50):
+            minos = bag.next()
+            self.assertEqual(sorted(m.name for m in minos), self.all)
+            orders.add(tuple(m.name for m in minos))
+        self.assertGreater(len(orders), 1)
+
+    def test_history_avoids_recent_pieces(self):
+        history = HistoryRandomizer(self.pieces, random.Random(2), history=4, tries=1000)
+        dealt = [history.next()[0].name for _ in range(200)]
+        for i in range(4, len(dealt)):
+            self.assertNotIn(dealt[i], dealt[i - 4:i])
+
+    def test_same_seed_same_pieces(self):
+        for randomizer in RANDOMIZERS:
+            with self.subTest(randomizer=randomizer):
+                first = Core(10, 20, FILENAME, randomizer=randomizer, seed=3)
+                second = Core(10, 20, FILENAME, randomizer=randomizer, seed=3)
+                other = Core(10, 20, FILENAME, randomizer=randomizer, seed=4)
+                self.assertEqual(names(first, 50), names(second, 50))
+                self.assertNotEqual(names(first, 50), names(other, 50))
+                self.assertLessEqual(set(names(other, 50)), set(self.all))
+
+    def test_games_do_not_share_a_stream(self):
+        first = Core(10, 20, FILENAME, seed=3)
+        expected = names(Core(10, 20, FILENAME, seed=3), 30)
+        # drawing from another game or the global stream changes nothing
+        other = Core(10, 20, FILENAME, seed=3)
+        dealt = []
+        for _ in range(30):
+            other.new_mino()
+            random.random()
+            dealt.append(first.new_mino().name)
+        self.assertEqual(dealt, expected)
+
+    def test_snapshot_keeps_the_history(self):
+        for randomizer in RANDOMIZERS:
+            with self.subTest(randomizer=randomizer):
+                sim = Simulator(10, 20, FILENAME, offset=0.5, angle=30, randomizer=randomizer)
+                sim.reset(3)
+                policy = RandomPolicy(4)
+                for _ in range(30):
+                    sim.step(policy(sim))
+                core = loads(dumps(sim.core), sim.core.pieces, FILENAME, sim.overlap)
+                self.assertEqual(core.randomizer.getstate(), sim.core.randomizer.getstate())
+                self.assertEqual(names(core, 50), names(sim.core, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+'''recorded games played again from the file they were saved to'''
+from batch import RandomPolicy
+from replay import Log, Player
+from simulator import COMMANDS
+from snapshot import dumps
+import os
+import replay
+import tempfile
+import unittest
+from unittest import mock
+
+FILENAME = 'pieces.json'
+
+
+def record(log: Log, seed: int):
+    '''random commands every 100 ms until the top out, the game after each'''
+    core = log.core()
+    policy = RandomPolicy(seed)
+    states = []
+    for t in range(0, 60000, 100):
+        if core.end:
+            break
+        command = policy.random.choice(policy.commands)
+        log.record(t, command, 0.5, core)
+        COMMANDS[command](core, 0.5, 0.5)
+        states.append(dumps(core))
+    return states
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.log = Log(5, 10, 20, FILENAME, 'grid', 'raster', randomizer='history', lookahead=3,
+                       interval=1000)
+        self.states = record(self.log, 6)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'game.replay')
+        self.log.save(self.path)
+
+    def test_log_round_trip(self):
+        log = Log.load(self.path)
+        self.assertEqual(log.events, self.log.events)
+        self.assertEqual(log.checkpoints, self.log.checkpoints)
+        self.assertEqual((log.randomizer, log.lookahead), ('history', 3))
+        self.assertGreater(len(log.checkpoints), 2)
+
+    def test_seek_starts_from_the_stored_checkpoint(self):
+        checkpoints = self.log.checkpoints
+        for i in (len(self.states) - 1, checkpoints[1].index + 3, checkpoints[0].index - 1):
+            with self.subTest(i=i):
+                player = Player(Log.load(self.path), interval=10 ** 9)
+                start = max([0] + [c.index for c in checkpoints if c.index <= i + 1])
+                with mock.patch('replay.apply', wraps=replay.apply) as apply:
+                    core = player.seek(i * 100)
+                self.assertEqual(apply.call_count, i + 1 - start)
+                self.assertEqual(dumps(core), self.states[i])
+
+    def test_seek_back_and_forth(self):
+        player = Player(Log.load(self.path), interval=1000)
+        # forward, back across checkpoints and forward again
+        for i in (len(self.states) - 1, 3, len(self.states) // 2, 0, len(self.states) - 1):
+            self.assertEqual(dumps(player.seek(i * 100)), self.states[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
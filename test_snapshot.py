@@ -0,0 +1,67 @@
+'''games saved with snapshot.dumps and carried on after snapshot.loads'''
+from batch import RandomPolicy
+from core import BOARDS
+from simulator import Simulator
+from snapshot import dumps, loads
+import numpy as np
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+def play(sim: Simulator, policy: RandomPolicy, steps: int):
+    for _ in range(steps):
+        if sim.core.end:
+            break
+        sim.step(policy(sim))
+
+
+def resume(sim: Simulator, data: bytes) -> Simulator:
+    other = Simulator(sim.width, sim.height, FILENAME, sim.backend, sim.overlap, sim.offset, sim.angle)
+    other.core = loads(data, sim.core.pieces, FILENAME, sim.overlap)
+    return other
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_round_trip(self):
+        for backend in BOARDS:
+            with self.subTest(backend=backend):
+                sim = Simulator(10, 20, FILENAME, backend, 'raster', offset=0.5, angle=30)
+                sim.reset(3)
+                play(sim, RandomPolicy(4), 30)
+                data = dumps(sim.core)
+                # a copy of a read-only buffer, views of a writable one
+                for buffer in (data, bytearray(data)):
+                    core = loads(buffer, sim.core.pieces, FILENAME, 'raster')
+                    self.assertEqual(dumps(core), data)
+                    np.testing.assert_array_equal(core.board.areas(), sim.core.board.areas())
+                    np.testing.assert_array_equal(core.board.rgba(), sim.core.board.rgba())
+
+    def test_loads_continues_the_game(self):
+        for backend in BOARDS:
+            with self.subTest(backend=backend):
+                sim = Simulator(10, 20, FILENAME, backend, 'raster', offset=0.5, angle=30)
+                sim.reset(3)
+                policy = RandomPolicy(4)
+                play(sim, policy, 30)
+                placed = sim.core.placed
+                other = resume(sim, dumps(sim.core))
+
+                state = policy.random.getstate()
+                play(sim, policy, 300)
+                policy.random.setstate(state)
+                play(other, policy, 300)
+                self.assertGreater(sim.core.placed, placed)
+                self.assertEqual(dumps(other.core), dumps(sim.core))
+                np.testing.assert_array_equal(other.core.board.rgba(), sim.core.board.rgba())
+
+    def test_not_a_snapshot(self):
+        sim = Simulator(10, 20, FILENAME)
+        data = bytearray(dumps(sim.core))
+        data[:4] = b'XXXX'
+        with self.assertRaises(ValueError):
+            loads(data, sim.core.pieces)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+'''SparseBoard against the GridBoard it stores a window of'''
+from bot import Bot
+from grid import EMPTY, GridBoard
+from simulator import Simulator
+from sparse import SparseBoard
+import numpy as np
+import unittest
+
+FILENAME = 'pieces.json'
+
+
+def board(seed: int, width: int = 6, height: int = 12):
+    '''areas in tenths from a random top row down, some rows full, and their colors'''
+    rng = np.random.default_rng(seed)
+    area = np.round(rng.integers(0, 11, (height, width)) / 10, 1).astype(np.float32)
+    area[:rng.integers(1, height)] = 0
+    area[rng.random(height) < 0.3] = 1
+    area[:2] = 0
+    color = rng.integers(0, 256, (height, width, 4)).astype(np.uint8)
+    color[area == 0] = EMPTY
+    return area, color
+
+
+class TestSparse(unittest.TestCase):
+    def test_clear_lines_matches_grid(self):
+        for seed in range(20):
+            for threshold in (100, 90, 60, 0):
+                with self.subTest(seed=seed, threshold=threshold):
+                    area, color = board(seed)
+                    grid = GridBoard.from_arrays(area.copy(), color.copy())
+                    sparse = SparseBoard.from_arrays(area.copy(), color.copy())
+                    self.assertEqual(sparse.clear_lines(threshold), grid.clear_lines(threshold))
+                    np.testing.assert_array_equal(sparse.areas(), grid.areas())
+                    np.testing.assert_array_equal(sparse.rgba(), grid.rgba())
+                    np.testing.assert_array_equal(sparse.row_weights(), grid.row_weights())
+                    # the window still starts at the highest occupied row
+                    self.assertEqual(len(sparse.area), sparse.height - sparse.top)
+                    occupied = np.flatnonzero(sparse.areas().any(axis=1))
+                    self.assertLessEqual(sparse.top, occupied[0] if len(occupied) else sparse.height)
+
+    def test_clearing_every_row(self):
+        area, color = board(1)
+        area[2:] = 1
+        sparse = SparseBoard.from_arrays(area, color)
+        self.assertEqual(sparse.clear_lines(100), 10)
+        self.assertEqual(sparse.top, sparse.height)
+        self.assertEqual(len(sparse.area), 0)
+        self.assertFalse(sparse.areas().any())
+
+    def test_game_matches_grid(self):
+        for threshold in (100, 80):
+            with self.subTest(threshold=threshold):
+                games = []
+                for backend in ('grid', 'sparse'):
+                    sim = Simulator(8, 30, FILENAME, backend, 'raster', threshold=threshold)
+                    sim.reset(12)
+                    bot = Bot(sim.core, depth=1)
+                    while sim.core.placed < 50 and not sim.core.end:
+                        sim.step(bot.plan())
+                    games.append(sim.core)
+                grid, sparse = games
+                self.assertGreater(grid.lines, 0)
+                self.assertEqual((sparse.points, sparse.lines, sparse.placed),
+                                 (grid.points, grid.lines, grid.placed))
+                np.testing.assert_array_equal(sparse.board.areas(), grid.board.areas())
+                np.testing.assert_array_equal(sparse.board.rgba(), grid.board.rgba())
+
+
+if __name__ == '__main__':
+    unittest.main()